@@ -1,16 +1,75 @@
-import tkinter as tk
-from src.handler import MParkingApp
-from src.ui import UI
+import time
+STARTED = time.perf_counter()
+
+import argparse
+from src.service import GateService, load_config
+from src.api import ApiServer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="M-Parking gate")
+    parser.add_argument("--config", help="File config gate (YAML/JSON) berisi daftar lane")
+    parser.add_argument("--headless", action="store_true", help="Jalankan service tanpa UI Tkinter")
+    parser.add_argument("--api-port", type=int, help="Port API HTTP lokal (default dari config, atau 8080 saat headless)")
+    return parser.parse_args()
+
+
+def start_api(service, config, port, headless):
+    api_config = config.get("api", {})
+    port = port or api_config.get("port") or (8080 if headless else None)
+    if not port:
+        return None
+    api = ApiServer(service, host=api_config.get("host", '127.0.0.1'), port=port)
+    api.start()
+    return api
+
+
+def run_headless(service, api):
+    print("[INFO] Service gate berjalan tanpa UI, tekan Ctrl+C untuk berhenti")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if api:
+            api.stop()
+        service.stop()
+
+
+def run_ui(service, api, config):
+    import tkinter as tk
+    from src.handler import MParkingApp
+    from src.ui import UI
 
-def main():
     root = tk.Tk()
-    app = MParkingApp(root)
+    app = MParkingApp(root, service, display_fps=config.get("ui", {}).get("display_fps", 15))
     app.ui = UI(app)
+    service.startup["ui_ready_s"] = time.perf_counter() - STARTED
+    print(f"[INFO] UI tampil {service.startup['ui_ready_s']:.1f} s sejak start, model dimuat di background")
 
     app.update_streams()
     app.update_table()
 
     root.mainloop()
+    if api:
+        api.stop()
+    service.stop()
+
+
+def main():
+    args = parse_args()
+    config = load_config(args.config) if args.config else {}
+
+    service = GateService(config, started_at=STARTED)
+    service.start()
+    service.startup["service_start_s"] = time.perf_counter() - STARTED
+    api = start_api(service, config, args.api_port, args.headless)
+
+    if args.headless:
+        run_headless(service, api)
+    else:
+        run_ui(service, api, config)
 
 if __name__ == "__main__":
     main()
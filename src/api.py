@@ -0,0 +1,98 @@
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from src import metrics
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Endpoint lokal:
+    GET /status             status service, kamera, pipeline, antrian OCR dan replikasi DB
+    GET /events?after=<seq> event plat terbaru dalam JSON
+    GET /events/stream      event plat live sebagai Server-Sent Events
+    GET /metrics            counter dan histogram latensi dalam format teks Prometheus
+    GET /trace?seconds=<n>  span n detik terakhir sebagai Chrome trace JSON (chrome://tracing, Perfetto)
+    """
+
+    service = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/status':
+            self.send_json(self.service.status())
+        elif url.path == '/events':
+            query = parse_qs(url.query)
+            try:
+                after = int(query.get('after', ['0'])[0])
+            except ValueError:
+                self.send_json({"error": "parameter after harus angka"}, status=400)
+                return
+            self.send_json(self.service.recent_events(after))
+        elif url.path == '/events/stream':
+            self.stream_events()
+        elif url.path == '/metrics':
+            self.send_text(metrics.REGISTRY.render_prometheus(), 'text/plain; version=0.0.4; charset=utf-8')
+        elif url.path == '/trace':
+            query = parse_qs(url.query)
+            try:
+                seconds = float(query.get('seconds', ['0'])[0])
+            except ValueError:
+                self.send_json({"error": "parameter seconds harus angka"}, status=400)
+                return
+            self.send_json(metrics.REGISTRY.chrome_trace(seconds or None))
+        else:
+            self.send_json({"error": "tidak ditemukan"}, status=404)
+
+    def send_json(self, data, status=200):
+        self.send_text(json.dumps(data, default=str), 'application/json', status)
+
+    def send_text(self, text, content_type, status=200):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_events(self):
+        subscriber = self.service.subscribe()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            while self.service.running:
+                try:
+                    event = subscriber.get(timeout=15)
+                    message = f"id: {event['seq']}\ndata: {json.dumps(event, default=str)}\n\n"
+                except queue.Empty:
+                    message = ": keepalive\n\n"
+                self.wfile.write(message.encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.service.unsubscribe(subscriber)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ApiServer(threading.Thread):
+    """HTTP API ringan untuk GateService, hanya listen di localhost secara default."""
+
+    def __init__(self, service, host='127.0.0.1', port=8080):
+        super().__init__(daemon=True)
+        handler = type('BoundApiHandler', (ApiHandler,), {"service": service})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+
+    def run(self):
+        host, port = self.server.server_address[:2]
+        print(f"[INFO] API gate berjalan di http://{host}:{port}")
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,299 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+from collections import defaultdict
+from datetime import datetime
+import cv2
+from src.cache import PlateCache, edit_distance
+from src.ocr_engine import ENGINES
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def iter_frames(path, max_frames=0, repeat=1):
+    """(key, frame) dari folder gambar, satu gambar, atau file video. key = nama file / nomor frame."""
+    if os.path.isdir(path):
+        files = sorted(f for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS))
+        sources = [(f, os.path.join(path, f)) for f in files]
+    elif path.lower().endswith(IMAGE_EXTENSIONS):
+        sources = [(os.path.basename(path), path)]
+    else:
+        sources = None
+
+    count = 0
+    for _ in range(repeat):
+        if sources is not None:
+            for key, file_path in sources:
+                frame = cv2.imread(file_path)
+                if frame is None:
+                    print(f"[WARNING] Gagal membaca gambar {file_path}")
+                    continue
+                yield key, frame
+                count += 1
+                if max_frames and count >= max_frames:
+                    return
+        else:
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                raise ValueError(f"Input tidak bisa dibuka: {path}")
+            index = 0
+            try:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    yield str(index), frame
+                    index += 1
+                    count += 1
+                    if max_frames and count >= max_frames:
+                        return
+            finally:
+                cap.release()
+
+
+def load_labels(path):
+    """CSV dengan kolom file,plate (untuk video: nomor frame,plate)."""
+    labels = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or row[0].strip().lower() in ('file', 'frame'):
+                continue
+            labels[row[0].strip()] = row[1].strip()
+    return labels
+
+
+def clean_plate(text):
+    return (text or '').upper().replace(' ', '')
+
+
+def summarize(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[int(p * (len(ordered) - 1))] * 1000.0
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000.0,
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000.0,
+    }
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux melaporkan KB, macOS byte
+        return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+    except ImportError:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024.0 * 1024.0)
+
+
+class Benchmark:
+    """Replay gambar / video lewat deteksi -> (ESRGAN) -> OCR -> cache -> DB, tanpa kamera, Mongo, atau GUI."""
+
+    def __init__(self, detector, ocr, db=None, roi=None, esrgan=False, labels=None):
+        self.detector = detector
+        self.ocr = ocr
+        self.db = db
+        self.roi = roi
+        self.esrgan = esrgan
+        self.labels = labels or {}
+
+        self.cache = PlateCache()
+        self.timings = defaultdict(list)
+        self.frames = 0
+        self.plates = 0
+        self.inserted = []
+        self.predictions = {}
+
+    def timed(self, stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.timings[stage].append(time.perf_counter() - start)
+        return result
+
+    def process(self, key, frame, record=True):
+        if not record:
+            # Warm-up: model dimuat dan di-JIT tanpa masuk statistik
+            for det in self.detector.detect(frame, self.roi):
+                crop = det["cropped_plate"]
+                if self.esrgan:
+                    crop = self.ocr.get_esrgan().enhance(crop)
+                self.ocr.perform_ocr_detail(crop)
+            return
+
+        start = time.perf_counter()
+        plates = self.timed("detect", self.detector.detect, frame, self.roi)
+        plates.sort(key=lambda det: det["confidence"], reverse=True)
+
+        best_text = None
+        for det in plates:
+            crop = det["cropped_plate"]
+            self.plates += 1
+            if self.esrgan:
+                # Crop hasil ESRGAN yang di-OCR, sama seperti tier esrgan di PlateOCR
+                crop = self.timed("esrgan", self.ocr.get_esrgan().enhance, crop)
+            text, conf, _ = self.timed("ocr", self.ocr.perform_ocr_detail, crop)
+            if not self.ocr.valid_plate(text):
+                continue
+            best_text = best_text or text
+
+            if not self.timed("cache", self.cache.is_recent, text):
+                self.cache.update(text)
+                if self.db is not None:
+                    self.timed("db_entry", self.db.insert_entry, text, datetime.now())
+                    self.inserted.append(text)
+
+        self.timings["frame"].append(time.perf_counter() - start)
+        self.frames += 1
+        self.predictions.setdefault(key, best_text)
+
+    def finish(self):
+        # Jalur keluar diukur terpisah untuk setiap plat yang masuk
+        if self.db is not None:
+            for text in self.inserted:
+                self.timed("db_exit", self.db.update_exit, text, datetime.now())
+
+    def accuracy(self):
+        if not self.labels:
+            return None
+        exact = detected = 0
+        char_total = char_errors = 0
+        mistakes = []
+        for key, expected in self.labels.items():
+            if key not in self.predictions:
+                continue
+            expected = clean_plate(expected)
+            predicted = clean_plate(self.predictions[key])
+            detected += bool(predicted)
+            if predicted == expected:
+                exact += 1
+            else:
+                mistakes.append({"input": key, "expected": expected, "predicted": predicted})
+            char_total += len(expected)
+            char_errors += min(len(expected), edit_distance(predicted, expected, len(expected)))
+        evaluated = sum(1 for key in self.labels if key in self.predictions)
+        return {
+            "labelled": evaluated,
+            "read_rate": detected / evaluated if evaluated else 0.0,
+            "exact_match": exact / evaluated if evaluated else 0.0,
+            "char_accuracy": 1.0 - char_errors / char_total if char_total else 0.0,
+            "mistakes": mistakes,
+        }
+
+    def report(self, wall_time):
+        return {
+            "frames": self.frames,
+            "plates": self.plates,
+            "wall_seconds": wall_time,
+            "fps": self.frames / wall_time if wall_time > 0 else 0.0,
+            "stages": {stage: summarize(samples) for stage, samples in self.timings.items()},
+            "peak_rss_mb": peak_rss_mb(),
+            "cache": self.cache.stats(),
+            "accuracy": self.accuracy(),
+        }
+
+
+def parse_roi(text):
+    if not text:
+        return None
+    roi = tuple(int(v) for v in text.split(','))
+    if len(roi) != 4:
+        raise argparse.ArgumentTypeError("ROI harus x1,y1,x2,y2")
+    return roi
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline pengenalan plat (tanpa kamera / Mongo / GUI)")
+    parser.add_argument('--input', default='test', help="Folder gambar, satu gambar, atau file video")
+    parser.add_argument('--labels', help="CSV file,plate untuk menghitung akurasi")
+    parser.add_argument('--output', help="Tulis hasil JSON ke file (default stdout)")
+    parser.add_argument('--model', default='model/platIndo2_yolov8s.pt')
+    parser.add_argument('--backend', default='torch', choices=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--device', default=None)
+    parser.add_argument('--ocr-engine', default=None, choices=['auto'] + list(ENGINES),
+                        help="Default env MPARK_OCR_ENGINE atau auto")
+    parser.add_argument('--esrgan', action='store_true',
+                        help="Upscale setiap crop dengan ESRGAN sebelum OCR (stage esrgan terpisah dari ocr)")
+    parser.add_argument('--esrgan-precision', default='fp32', choices=['fp32', 'bf16', 'fp16'])
+    parser.add_argument('--esrgan-tile', type=int, default=0)
+    parser.add_argument('--roi', type=parse_roi, help="x1,y1,x2,y2 dalam koordinat frame input")
+    parser.add_argument('--no-db', action='store_true', help="Lewati layer database")
+    parser.add_argument('--max-frames', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help="Ulangi input beberapa kali")
+    parser.add_argument('--warmup', type=int, default=1, help="Frame awal yang tidak masuk statistik")
+    args = parser.parse_args()
+
+    # Log aplikasi ke stderr, stdout hanya untuk JSON
+    with contextlib.redirect_stdout(sys.stderr), tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        from src.deteksi import PlateDetector
+        from src.ocr import PlateOCR
+        from src.db import ParkingDatabase
+
+        load_start = time.perf_counter()
+        detector = PlateDetector(model_path=args.model, device=args.device, backend=args.backend)
+        ocr = PlateOCR(engine=args.ocr_engine)
+        if args.esrgan:
+            from src.ersgan import ESRGAN
+            ocr.esrgan = ESRGAN(device=args.device, tile_size=args.esrgan_tile, precision=args.esrgan_precision)
+        # Database lokal sementara, Mongo tidak disentuh
+        db = None if args.no_db else ParkingDatabase(mongo_uri=None, local_path=os.path.join(tmp, 'bench.sqlite3'))
+        load_time = time.perf_counter() - load_start
+
+        labels = load_labels(args.labels) if args.labels else None
+        bench = Benchmark(detector, ocr, db, roi=args.roi, esrgan=args.esrgan, labels=labels)
+
+        if args.warmup > 0:
+            for _, frame in iter_frames(args.input, args.warmup):
+                bench.process(None, frame, record=False)
+
+        start = time.perf_counter()
+        for key, frame in iter_frames(args.input, args.max_frames, args.repeat):
+            bench.process(key, frame)
+        bench.finish()
+        wall_time = time.perf_counter() - start
+
+        result = bench.report(wall_time)
+        result["load_seconds"] = load_time
+        result["config"] = {
+            "input": args.input,
+            "backend": detector.backend,
+            "device": detector.device,
+            "ocr_engine": type(ocr.engine).__name__,
+            "esrgan": args.esrgan,
+            "esrgan_precision": args.esrgan_precision if args.esrgan else None,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "platform": platform.platform(),
+        }
+        if db is not None:
+            db.close()
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"[INFO] Hasil benchmark ditulis ke {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,206 @@
-from datetime import datetime, timedelta
+import time
+import threading
+from collections import OrderedDict, defaultdict
+from src.utils import hamming_distance
+
+# Karakter yang sering tertukar oleh OCR dipetakan ke satu bentuk kanonik
+OCR_CONFUSIONS = str.maketrans({
+    '0': 'O', 'Q': 'O', 'D': 'O',
+    '8': 'B',
+    '1': 'I', 'L': 'I',
+    '5': 'S',
+    '2': 'Z',
+    '6': 'G',
+})
+
+
+def normalize_plate(plate_text):
+    return plate_text.upper().replace(' ', '').translate(OCR_CONFUSIONS)
+
+
+def ngrams(key, n=2):
+    padded = f"^{key}$"
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def edit_distance(a, b, max_distance):
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > max_distance:
+            return max_distance + 1
+        prev = cur
+    return prev[-1]
+
 
 class PlateCache:
-    def __init__(self, expiry_seconds=60):
-        self.cache = {}
+    """Cache TTL plat yang baru diproses, dengan batas ukuran dan lookup fuzzy berbasis index n-gram.
+
+    Plat dicocokkan pada key kanonik (karakter yang sering tertukar OCR sudah disamakan). Default
+    max_distance 0: plat lain yang beda satu karakter, mis. B1235CD, adalah kendaraan lain dan tidak
+    boleh dianggap baru diproses.
+    """
+
+    def __init__(self, expiry_seconds=60, max_size=1024, max_distance=0, ngram_size=2):
         self.expiry_seconds = expiry_seconds
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.ngram_size = ngram_size
+
+        # key kanonik -> (plat asli, waktu update), urut dari yang paling lama di-update
+        self.cache = OrderedDict()
+        self.index = defaultdict(set)
+
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
 
     def is_recent(self, plate_text):
-        now = datetime.now()
-        for cached_plate, last_time in self.cache.items():
-            if (plate_text in cached_plate) or (cached_plate in plate_text):
-                if now - last_time < timedelta(seconds=self.expiry_seconds):
-                    return True
+        self.expire()
+        key = normalize_plate(plate_text)
+        if key in self.cache:
+            self.hits += 1
+            return True
+        if self.max_distance > 0 and self.lookup_fuzzy(plate_text) is not None:
+            self.fuzzy_hits += 1
+            return True
+        self.misses += 1
         return False
 
+    def lookup_fuzzy(self, plate_text, max_distance=None):
+        """Cari plat di cache dengan edit distance kecil dari key kanonik. Return plat asli atau None."""
+        max_distance = self.max_distance if max_distance is None else max_distance
+        key = normalize_plate(plate_text)
+        grams = ngrams(key, self.ngram_size)
+
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self.index.get(gram, ()):
+                shared[candidate] += 1
+
+        # Satu edit mengubah paling banyak n n-gram, kandidat dengan terlalu sedikit n-gram sama dilewati
+        min_shared = len(grams) - self.ngram_size * max_distance
+        best, best_distance = None, max_distance + 1
+        for candidate, count in shared.items():
+            if count >= min_shared:
+                distance = edit_distance(key, candidate, max_distance)
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+
+        if best is None:
+            return None
+        return self.cache[best][0]
+
     def update(self, plate_text):
-        self.cache[plate_text] = datetime.now()
+        key = normalize_plate(plate_text)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        else:
+            for gram in ngrams(key, self.ngram_size):
+                self.index[gram].add(key)
+        self.cache[key] = (plate_text, time.monotonic())
+
+        while len(self.cache) > self.max_size:
+            self.remove_oldest()
+            self.evictions += 1
+
+    def remove_oldest(self):
+        key, _ = self.cache.popitem(last=False)
+        for gram in ngrams(key, self.ngram_size):
+            keys = self.index.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.index[gram]
+
+    def expire(self):
+        deadline = time.monotonic() - self.expiry_seconds
+        while self.cache:
+            _, last_time = next(iter(self.cache.values()))
+            if last_time >= deadline:
+                break
+            self.remove_oldest()
+            self.expirations += 1
 
     def clear(self):
-        now = datetime.now()
-        to_remove = [plate for plate, last_time in self.cache.items()
-                     if now - last_time > timedelta(seconds=self.expiry_seconds)]
-        for plate in to_remove:
-            del self.cache[plate]
+        self.expire()
+
+    def stats(self):
+        return {
+            "size": len(self.cache),
+            "hits": self.hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CropCache:
+    """LRU fingerprint crop (dHash) -> hasil OCR, untuk satu lane.
+
+    Hit hanya berlaku di dalam track yang sama: dHash tidak bisa membedakan plat. Plat render
+    "B 1234 CD" dan "B 1284 CD" hanya berjarak 2 bit, sedangkan crop plat yang sama bergeser 1-3 px
+    berjarak 11-46 bit dari 256 (dHash 16x16). Jadi crop track lain tidak pernah memakai hasil cache,
+    dan max_distance 48 hanya menentukan kapan crop track yang sama cukup mirip untuk tidak di-OCR lagi
+    (mis. kendaraan diam di depan palang).
+    """
+
+    def __init__(self, max_size=128, max_distance=48, ttl_seconds=3.0, max_aspect_diff=0.2):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.max_aspect_diff = max_aspect_diff
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (track_id, fingerprint) -> (aspect, hasil, waktu)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, fingerprint, aspect, track_id):
+        if fingerprint is None or track_id is None:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            # Urutan entries adalah urutan LRU, bukan umur: setiap entry dicek umurnya sendiri
+            expired = [key for key, (_, _, added) in self.entries.items() if now - added > self.ttl_seconds]
+            for key in expired:
+                del self.entries[key]
+
+            for key, (cached_aspect, result, _) in reversed(self.entries.items()):
+                if key[0] != track_id:
+                    continue
+                if abs(cached_aspect - aspect) > self.max_aspect_diff * cached_aspect:
+                    continue
+                if hamming_distance(key[1], fingerprint) <= self.max_distance:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+            self.misses += 1
+            return None
+
+    def add(self, fingerprint, aspect, track_id, result):
+        if fingerprint is None or track_id is None:
+            return
+        key = (track_id, fingerprint)
+        with self.lock:
+            self.entries[key] = (aspect, result, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -1,51 +1,219 @@
+import os
 import time
 import threading
+from collections import deque
+from functools import lru_cache
+import cv2
+from src import metrics
+
+# Opsi FFmpeg low-latency: RTSP lewat TCP, tanpa buffering di demuxer
+FFMPEG_LOW_LATENCY = "rtsp_transport;tcp|fflags;nobuffer|flags;low_delay|max_delay;0"
+STREAM_PREFIXES = ('rtsp://', 'rtsps://', 'rtmp://', 'http://', 'https://')
+CAPTURE_BACKENDS = ('auto', 'gstreamer', 'ffmpeg', 'opencv')
+
+
+def parse_source(src):
+    if isinstance(src, str) and src.isdigit():
+        return int(src)
+    return src
+
+
+def is_stream_url(source):
+    return isinstance(source, str) and source.lower().startswith(STREAM_PREFIXES)
+
+
+@lru_cache(maxsize=1)
+def gstreamer_available():
+    for line in cv2.getBuildInformation().splitlines():
+        if line.strip().startswith('GStreamer:'):
+            return 'YES' in line
+    return False
+
+
+def gstreamer_pipeline(source, width=None, height=None):
+    """decodebin memilih decoder hardware kalau ada, videoscale langsung ke resolusi deteksi."""
+    if source.lower().startswith(('rtsp://', 'rtsps://')):
+        src = f'rtspsrc location="{source}" protocols=tcp latency=0 ! decodebin'
+    else:
+        src = f'uridecodebin uri="{source}"'
+    caps = "video/x-raw,format=BGR"
+    if width and height:
+        caps += f",width={width},height={height}"
+    return f"{src} ! videoconvert ! videoscale ! {caps} ! appsink drop=true max-buffers=1 sync=false"
+
+
+def open_capture(source, backend='auto', width=None, height=None, timeout_ms=5000):
+    """Buka sumber kamera. Stream jaringan memakai GStreamer atau FFmpeg dengan opsi low-latency,
+    webcam lokal dan file video memakai cv2.VideoCapture biasa."""
+    if backend not in CAPTURE_BACKENDS:
+        raise ValueError(f"Backend capture tidak dikenal: {backend}. Pilihan: {CAPTURE_BACKENDS}")
+    source = parse_source(source)
+    if backend == 'opencv' or not is_stream_url(source):
+        return cv2.VideoCapture(source)
+
+    if backend in ('auto', 'gstreamer') and gstreamer_available():
+        cap = cv2.VideoCapture(gstreamer_pipeline(source, width, height), cv2.CAP_GSTREAMER)
+        if cap.isOpened() or backend == 'gstreamer':
+            return cap
+        print(f"[WARNING] GStreamer gagal membuka {source}, memakai FFmpeg")
+    elif backend == 'gstreamer':
+        print("[WARNING] OpenCV dibangun tanpa GStreamer, memakai FFmpeg")
+
+    # Opsi dibaca OpenCV saat capture dibuka, nilai dari environment pengguna tidak ditimpa
+    os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", FFMPEG_LOW_LATENCY)
+    cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG, [
+        cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms,
+        cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms,
+    ])
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
 
 class Camera(threading.Thread):
-    def __init__(self, cap_getter, frame_setter, error_callback, fps=20):
-        super().__init__(daemon=True)
+    """Thread capture satu kamera.
+
+    Setiap frame di-grab supaya buffer RTSP tidak menumpuk, tetapi hanya di-decode (retrieve)
+    kalau konsumen siap menerima frame baru (`frame_wanted`). Frame dikirim bersama nomor urut
+    dan waktu capture agar latensi capture -> tampil bisa diukur.
+
+    Kalau `opener` diberikan, stream live yang terputus dibuka ulang dengan backoff eksponensial;
+    `error_callback` hanya dipanggil kalau kamera benar-benar berhenti (mis. file video habis).
+    """
+
+    def __init__(self, cap_getter, frame_setter, error_callback, fps=20, frame_wanted=None, opener=None,
+                 reconnect_max_delay=30.0, name=None):
+        super().__init__(daemon=True, name=f"camera-{name}" if name else None)
+        self.lane = name
         self.cap_getter = cap_getter
         self.frame_setter = frame_setter
         self.error_callback = error_callback
+        self.frame_wanted = frame_wanted
+        self.opener = opener
+        self.reconnect_max_delay = reconnect_max_delay
         self.running = True
+        self.connected = True
         self.fps = fps
         self.frame_delay = 1.0 / fps
 
         self.cap = self.cap_getter()
+        # File video dibatasi ke fps, stream live mengikuti kecepatan sumber lewat grab()
+        self.realtime = self.cap.get(cv2.CAP_PROP_FRAME_COUNT) <= 0
+
+        self.seq = 0
+        self.grabbed = 0
+        self.decoded = 0
+        self.skipped = 0
+        self.retrieve_failures = 0
+        self.read_failures = 0
+        self.reconnects = 0
+        self.decode_time = deque(maxlen=100)
+
         self.frame_count = 0
         self.start_time = time.perf_counter()
         self.current_fps = 0
+        self.decode_fps = 0
+        self.decode_count = 0
 
     def run(self):
+        try:
+            self.capture_loop()
+        finally:
+            self.cap.release()
+
+    def capture_loop(self):
         while self.running:
-            start_time = time.time()
+            start_time = time.perf_counter()
 
-            ret, frame = self.cap.read()
-            if not ret:
+            grabbed = self.cap.grab()
+            metrics.record("camera_grab", start_time, time.perf_counter(), lane=self.lane)
+            if not grabbed:
+                self.read_failures += 1
+                metrics.inc("camera_read_failures_total", lane=self.lane)
+                if self.opener is not None and self.realtime and self.reconnect():
+                    continue
+                if not self.running:
+                    return
                 print("[ERROR] Gagal membaca frame")
                 self.error_callback()
                 self.running = False  # stop thread
                 return  # keluar dari run
-
-            self.frame_setter(frame)
-            time.sleep(self.frame_delay)
-
-            # Update penghitung frame
+            self.grabbed += 1
             self.frame_count += 1
-            elapsed_total = time.time() - self.start_time
+
+            if self.frame_wanted is None or self.frame_wanted():
+                decode_start = time.perf_counter()
+                ret, frame = self.cap.retrieve()
+                if ret:
+                    self.seq += 1
+                    self.decoded += 1
+                    self.decode_count += 1
+                    captured_at = time.perf_counter()
+                    self.decode_time.append(captured_at - decode_start)
+                    metrics.record("camera_decode", decode_start, captured_at, lane=self.lane)
+                    self.frame_setter(frame, self.seq, captured_at)
+                else:
+                    self.retrieve_failures += 1
+            else:
+                # Konsumen masih memproses frame sebelumnya, frame ini tidak perlu di-decode
+                self.skipped += 1
+                metrics.inc("camera_frames_skipped_total", lane=self.lane)
 
             # Update FPS setiap 1 detik
+            now = time.perf_counter()
+            elapsed_total = now - self.start_time
             if elapsed_total >= 1.0:
                 self.current_fps = self.frame_count / elapsed_total
+                self.decode_fps = self.decode_count / elapsed_total
                 self.frame_count = 0
-                self.start_time = time.time()
+                self.decode_count = 0
+                self.start_time = now
 
-            elapsed = time.time() - start_time
-            sleep_time = self.frame_delay - elapsed
-            if sleep_time > 0:
-                time.sleep(sleep_time)
+            if not self.realtime:
+                sleep_time = self.frame_delay - (now - start_time)
+                if sleep_time > 0:
+                    time.sleep(sleep_time)
+
+    def reconnect(self):
+        self.connected = False
+        self.cap.release()
+        delay = 0.5
+        while self.running:
+            print(f"[WARNING] Kamera terputus, menyambung ulang dalam {delay:.1f} s")
+            time.sleep(delay)
+            try:
+                cap = self.opener()
+            except Exception as e:
+                print(f"[ERROR] Gagal membuka ulang kamera: {e}")
+                cap = None
+            if cap is not None and cap.isOpened():
+                self.cap = cap
+                self.connected = True
+                self.reconnects += 1
+                metrics.inc("camera_reconnects_total", lane=self.lane)
+                print("[INFO] Kamera tersambung kembali")
+                return True
+            if cap is not None:
+                cap.release()
+            delay = min(delay * 2, self.reconnect_max_delay)
+        return False
+
+    def stats(self):
+        samples = list(self.decode_time)
+        return {
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "read_failures": self.read_failures,
+            "retrieve_failures": self.retrieve_failures,
+            "fps": self.current_fps,
+            "decode_fps": self.decode_fps,
+            "seq": self.seq,
+            "grabbed": self.grabbed,
+            "decoded": self.decoded,
+            "skipped": self.skipped,
+            "decode_ms": (sum(samples) / len(samples) * 1000.0) if samples else 0.0,
+        }
 
     def stop(self):
+        # cap dilepas oleh thread capture sendiri supaya tidak release saat grab() berjalan
         self.running = False
-        if self.cap:
-            self.cap.release()
@@ -1,49 +1,96 @@
-import pymongo
+import uuid
 from datetime import datetime
+from src import metrics
+from src.storage import SqliteStore, MongoStore, LOCAL_DB_PATH, DESCENDING
+from src.db_writer import DbWriter
 
 class ParkingDatabase:
-    def __init__(self):
-        self.client = pymongo.MongoClient("mongodb://localhost:27017/")
-        self.db = self.client["parking"]
-        self.col = self.db["db_plat"]
-        self.col.create_index([("plat_nomor", pymongo.ASCENDING), ("waktu_keluar", pymongo.ASCENDING)])
+    """Semua event ditulis dulu ke store lokal (SQLite), lalu direplikasi ke Mongo oleh DbWriter.
 
+    Pembacaan memakai Mongo jika tersedia saat start, selain itu memakai store lokal,
+    sehingga aplikasi tetap berjalan tanpa Mongo sama sekali.
+    """
+
+    def __init__(self, mongo_uri="mongodb://localhost:27017/", local_path=LOCAL_DB_PATH):
+        self.local = SqliteStore(local_path)
+        self.remote = None
+        if mongo_uri:
+            try:
+                self.remote = MongoStore(mongo_uri)
+            except ImportError as e:
+                print(f"[WARNING] {e}, memakai database lokal {local_path} saja")
+
+        if self.remote is not None and self.remote.ping():
+            try:
+                self.remote.ensure_indexes()
+            except Exception as e:
+                # DbWriter mencoba lagi sebelum setiap batch, replikasi tertahan sampai index siap
+                print(f"[ERROR] Index Mongo belum siap, replikasi ditahan: {e}")
+            self.reader = self.remote
+        else:
+            if self.remote is not None:
+                print(f"[WARNING] Mongo {mongo_uri} tidak bisa dihubungi, memakai database lokal {local_path}")
+            self.reader = self.local
+
+        self.writer = DbWriter(self.local, self.remote)
+        if self.remote is not None:
+            self.writer.start()
+
+    @metrics.timed("db", op="insert_entry")
     def insert_entry(self, plat_nomor, waktu_masuk):
         try:
-            existing_entry = self.col.find_one({"plat_nomor": plat_nomor, "waktu_keluar": None})
-            if existing_entry:
+            inserted = self.local.append_event(uuid.uuid4().hex, 'masuk', plat_nomor, waktu_masuk)
+            self.writer.notify()
+            if inserted:
+                print(f"[INFO] Plat nomor {plat_nomor} berhasil disimpan.")
+            else:
                 print(f"[INFO] Plat nomor {plat_nomor} sudah ada, tidak disimpan lagi.")
-                return False
-            self.col.insert_one({
-                "plat_nomor": plat_nomor,
-                "waktu_masuk": waktu_masuk,
-                "waktu_keluar": None
-            })
-            print(f"[INFO] Plat nomor {plat_nomor} berhasil disimpan.")
-            return True
+            return inserted
         except Exception as e:
             print(f"[ERROR] Gagal insert entry: {e}")
             return False
 
-    def update_exit(self, plat_nomor):
+    @metrics.timed("db", op="update_exit")
+    def update_exit(self, plat_nomor, waktu_keluar=None):
         try:
-            result = self.col.update_one(
-                {"plat_nomor": plat_nomor, "waktu_keluar": None},
-                {"$set": {"waktu_keluar": datetime.now()}}
-            )
-            if result.modified_count > 0:
+            updated = self.local.append_event(uuid.uuid4().hex, 'keluar', plat_nomor, waktu_keluar or datetime.now())
+            self.writer.notify()
+            if updated:
                 print(f"[INFO] Plat nomor {plat_nomor} keluar, data diperbarui.")
-                return True
             else:
+                # Sesi bisa saja tercatat dari gate lain, event tetap direplikasi ke Mongo
                 print(f"[WARNING] Plat nomor {plat_nomor} tidak ditemukan untuk update keluar.")
-                return False
+            return updated
         except Exception as e:
             print(f"[ERROR] Gagal update exit: {e}")
             return False
 
+    @metrics.timed("db", op="fetch_all_entries")
     def fetch_all_entries(self):
-        try:
-            return list(self.col.find({}))
-        except Exception as e:
-            print(f"[ERROR] Gagal fetch entries: {e}")
-            return []
\ No newline at end of file
+        return self.reader.fetch_all_entries()
+
+    @metrics.timed("db", op="fetch_open_entries")
+    def fetch_open_entries(self):
+        return self.reader.fetch_open_entries()
+
+    @metrics.timed("db", op="fetch_recent_entries")
+    def fetch_recent_entries(self, limit=200):
+        return self.reader.fetch_recent_entries(limit)
+
+    @metrics.timed("db", op="fetch_changes_since")
+    def fetch_changes_since(self, since):
+        """Entry yang dibuat / diubah sejak `since` (field diperbarui), untuk update tabel secara incremental."""
+        return self.reader.fetch_changes_since(since)
+
+    @metrics.timed("db", op="find_page")
+    def find_page(self, filter=None, sort=DESCENDING, cursor=None, limit=50):
+        """Satu halaman riwayat, urut waktu_masuk lalu _id.
+
+        filter: dict dengan key opsional plate_prefix, start, end (rentang waktu_masuk).
+        cursor: (waktu_masuk, _id) entry terakhir halaman sebelumnya.
+        Return (entries, cursor_berikutnya); cursor None jika sudah halaman terakhir.
+        """
+        return self.reader.find_page(filter, sort, cursor, limit)
+
+    def close(self):
+        self.writer.stop()
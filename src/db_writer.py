@@ -0,0 +1,115 @@
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from src import metrics
+
+CHECKPOINT_NAME = 'mongo'
+
+
+class DbWriter(threading.Thread):
+    """Replikator write-behind: event dari store lokal dikirim ke Mongo sebagai bulk_write.
+
+    Posisi terakhir yang sudah masuk Mongo disimpan sebagai checkpoint di store lokal,
+    jadi setelah Mongo mati atau aplikasi restart replikasi lanjut dari event berikutnya.
+    """
+
+    def __init__(self, local, remote, batch_size=100, flush_interval=0.5, retry_max_delay=30.0):
+        super().__init__(daemon=True)
+        self.local = local
+        self.remote = remote
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_max_delay = retry_max_delay
+        self.wake = threading.Event()
+        self.running = True
+
+        self.lock = threading.Lock()
+        self.committed = 0
+        self.batches = 0
+        self.retries = 0
+        self.commit_latency = deque(maxlen=200)
+        self.checkpoint = local.get_checkpoint(CHECKPOINT_NAME)
+
+    def notify(self):
+        self.wake.set()
+
+    @staticmethod
+    def coalesce(events):
+        # Event berurutan yang sama (plat + jenis) cukup ditulis sekali
+        result = []
+        for event in events:
+            if result and result[-1]["kind"] == event["kind"] and result[-1]["plat_nomor"] == event["plat_nomor"]:
+                continue
+            result.append(event)
+        return result
+
+    def build_ops(self, events):
+        ops = []
+        for event in events:
+            if event["kind"] == 'masuk':
+                ops.append(self.remote.entry_op(event["plat_nomor"], event["waktu"]))
+            else:
+                ops.append(self.remote.exit_op(event["plat_nomor"], event["waktu"]))
+        return ops
+
+    def write(self, events):
+        # Tanpa index sesi_aktif_unik, upsert entry bisa membuat sesi aktif dobel: batch gagal dan dicoba lagi
+        self.remote.ensure_indexes()
+        self.remote.bulk_write(self.build_ops(self.coalesce(events)))
+
+    def run(self):
+        delay = 0.5
+        while self.running:
+            events = self.local.events_after(self.checkpoint, self.batch_size)
+            if not events:
+                self.wake.wait(timeout=1.0)
+                self.wake.clear()
+                continue
+            if len(events) < self.batch_size:
+                # Beri kesempatan event lain ikut satu batch
+                time.sleep(self.flush_interval)
+                events = self.local.events_after(self.checkpoint, self.batch_size)
+
+            try:
+                metrics.observe("db_replicate_batch_size", len(events), metrics.SIZE_BUCKETS)
+                with metrics.timer("db_replicate", args={"batch": len(events)}):
+                    self.write(events)
+            except Exception as e:
+                print(f"[ERROR] Gagal replikasi {len(events)} event ke Mongo, coba lagi {delay:.1f} s: {e}")
+                with self.lock:
+                    self.retries += 1
+                metrics.inc("db_replicate_retries_total")
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_max_delay)
+                continue
+            delay = 0.5
+
+            self.checkpoint = events[-1]["seq"]
+            self.local.set_checkpoint(CHECKPOINT_NAME, self.checkpoint)
+            now = datetime.now()
+            with self.lock:
+                self.committed += len(events)
+                self.batches += 1
+                for event in events:
+                    self.commit_latency.append((now - event["dibuat"]).total_seconds())
+            metrics.inc("db_replicated_events_total", len(events))
+
+    def stats(self):
+        with self.lock:
+            ordered = sorted(self.commit_latency)
+            return {
+                # Tanpa Mongo tidak ada yang direplikasi, selisih seq bukan antrian
+                "enabled": self.remote is not None,
+                "queue_depth": self.local.last_seq() - self.checkpoint if self.remote is not None else 0,
+                "checkpoint": self.checkpoint,
+                "committed": self.committed,
+                "batches": self.batches,
+                "retries": self.retries,
+                "commit_avg_ms": (sum(ordered) / len(ordered) * 1000.0) if ordered else 0.0,
+                "commit_p95_ms": (ordered[int(0.95 * (len(ordered) - 1))] * 1000.0) if ordered else 0.0,
+            }
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
@@ -1,12 +1,68 @@
-import torch
-from ultralytics import YOLO
+import os
+import cv2
+import numpy as np
+from src import metrics
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+
+
+def artifact_path(model_path, backend, int8=False):
+    """Lokasi hasil export backend, diletakkan di samping file .pt."""
+    stem = os.path.splitext(model_path)[0]
+    suffix = '_int8' if int8 else ''
+    if backend == 'onnx':
+        return f"{stem}{suffix}.onnx"
+    if backend == 'openvino':
+        return f"{stem}{suffix}_openvino_model"
+    return model_path
+
+
+def resolve_model(model_path, backend, int8=False):
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend tidak dikenal: {backend} (pilihan: {', '.join(BACKENDS)})")
+    if backend == 'torch':
+        return model_path, 'torch'
+
+    # Utamakan artefak INT8, lalu FP32, terakhir fallback ke .pt
+    candidates = [artifact_path(model_path, backend, True), artifact_path(model_path, backend, False)]
+    if not int8:
+        candidates.reverse()
+    for path in candidates:
+        if os.path.exists(path):
+            return path, backend
+
+    print(f"[WARNING] Artefak {backend} untuk {model_path} belum ada, fallback ke torch. "
+          f"Jalankan: python -m src.export_model --backend {backend}")
+    return model_path, 'torch'
+
 
 class PlateDetector:
-    def __init__(self, model_path='model/platIndo2_yolov8s.pt', conf_threshold=0.8, device=None):
+    def __init__(self, model_path='model/platIndo2_yolov8s.pt', conf_threshold=0.8, device=None, imgsz=640,
+                 backend='torch', int8=True):
+        # torch / ultralytics di-import di sini supaya import modul tetap cepat
+        import torch
+        from ultralytics import YOLO
+
         self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model = YOLO(model_path).to(self.device)
+        resolved_path, self.backend = resolve_model(model_path, backend, int8)
+        if self.backend == 'torch':
+            self.model = YOLO(model_path).to(self.device)
+        else:
+            # Model hasil export dijalankan lewat ONNX Runtime / OpenVINO di CPU
+            self.device = 'cpu'
+            self.model = YOLO(resolved_path, task='detect')
+        print(f"[INFO] Detector memakai backend {self.backend}: {resolved_path}")
         self.conf_threshold = conf_threshold
+        self.imgsz = imgsz
+        # Canvas letterbox per posisi batch, dipakai ulang setiap panggilan detect_batch
+        self.letterbox_buffers = []
 
+    def warmup(self, frame_shape=(360, 640, 3), batch_size=1):
+        """Satu forward pass dengan frame kosong: inisialisasi lazy (CUDA context, graph ONNX/OpenVINO)."""
+        frames = [np.zeros(frame_shape, dtype=np.uint8) for _ in range(batch_size)]
+        self.detect_batch(frames)
+
+    @metrics.timed("detect")
     def detect(self, frame, roi=None):
         x1_roi, y1_roi = 0, 0
         if roi:
@@ -16,20 +72,74 @@ class PlateDetector:
             frame_for_detection = frame
 
         results = self.model(frame_for_detection, conf=self.conf_threshold, verbose=False)[0]
+        return self.collect_plates(frame, results, x1_roi, y1_roi)
+
+    @metrics.timed("detect_batch")
+    def detect_batch(self, frames, rois=None):
+        """Deteksi beberapa lane sekaligus dengan satu forward pass.
+
+        Crop ROI tiap lane di-letterbox ke ukuran yang sama lalu di-stack jadi satu batch.
+        Hasilnya list deteksi per lane dengan koordinat full-frame, urutannya sama dengan frames.
+        """
+        if rois is None:
+            rois = [None] * len(frames)
 
+        batch = []
+        metas = []
+        for frame, roi in zip(frames, rois):
+            x1_roi, y1_roi = 0, 0
+            if roi:
+                x1_roi, y1_roi, x2_roi, y2_roi = roi
+                crop = frame[y1_roi:y2_roi, x1_roi:x2_roi]
+            else:
+                crop = frame
+
+            if crop.size == 0:
+                metas.append(None)
+                continue
+
+            if len(self.letterbox_buffers) <= len(batch):
+                self.letterbox_buffers.append(np.empty((self.imgsz, self.imgsz, 3), dtype=np.uint8))
+            letterboxed, scale, pad_x, pad_y = letterbox(crop, self.imgsz,
+                                                         out=self.letterbox_buffers[len(batch)])
+            batch.append(letterboxed)
+            metas.append((x1_roi, y1_roi, scale, pad_x, pad_y))
+
+        results = []
+        if batch:
+            metrics.observe("detect_batch_size", len(batch), metrics.SIZE_BUCKETS)
+            with metrics.timer("detect_inference", args={"batch": len(batch)}):
+                results = self.model(batch, conf=self.conf_threshold, imgsz=self.imgsz, verbose=False)
+
+        all_plates = []
+        result_iter = iter(results)
+        for frame, meta in zip(frames, metas):
+            if meta is None:
+                all_plates.append([])
+                continue
+            x1_roi, y1_roi, scale, pad_x, pad_y = meta
+            all_plates.append(self.collect_plates(frame, next(result_iter), x1_roi, y1_roi,
+                                                  scale, pad_x, pad_y))
+        return all_plates
+
+    def collect_plates(self, frame, results, x_offset=0, y_offset=0, scale=1.0, pad_x=0, pad_y=0):
         plates = []
+        frame_h, frame_w = frame.shape[:2]
         for box in results.boxes:
             conf = box.conf.cpu().item()
             if conf < self.conf_threshold:
                 continue
 
-            x1, y1, x2, y2 = box.xyxy.cpu().numpy().astype(int)[0]
+            x1, y1, x2, y2 = box.xyxy.cpu().numpy()[0]
 
-            if roi:
-                x1 += x1_roi
-                y1 += y1_roi
-                x2 += x1_roi
-                y2 += y1_roi
+            # Kembalikan koordinat letterbox ke koordinat full-frame
+            x1 = int((x1 - pad_x) / scale) + x_offset
+            y1 = int((y1 - pad_y) / scale) + y_offset
+            x2 = int((x2 - pad_x) / scale) + x_offset
+            y2 = int((y2 - pad_y) / scale) + y_offset
+
+            x1, x2 = max(0, x1), min(frame_w, x2)
+            y1, y2 = max(0, y1), min(frame_h, y2)
 
             cropped_plate = frame[y1:y2, x1:x2]
             if cropped_plate.size == 0:
@@ -41,4 +151,23 @@ class PlateDetector:
                 "cropped_plate": cropped_plate
             })
 
-        return plates
\ No newline at end of file
+        return plates
+
+
+def letterbox(img, size, color=(114, 114, 114), out=None):
+    """Resize img ke kotak size x size dengan padding. `out` (opsional) dipakai ulang sebagai canvas."""
+    h, w = img.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+
+    if out is None:
+        canvas = np.full((size, size, 3), color, dtype=np.uint8)
+    else:
+        canvas = out
+        canvas[:] = color
+    pad_x = (size - new_w) // 2
+    pad_y = (size - new_h) // 2
+    # Resize langsung ke dalam canvas, tanpa array perantara
+    cv2.resize(img, (new_w, new_h), dst=canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w],
+               interpolation=cv2.INTER_LINEAR)
+    return canvas, scale, pad_x, pad_y
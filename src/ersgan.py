@@ -1,8 +1,12 @@
 import os
 import cv2
 import sys
+import time
 import torch
+import contextlib
 import numpy as np
+from collections import deque
+from src import metrics
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ESRGAN_PATH = os.path.join(BASE_DIR, '../ESRGAN')
@@ -15,11 +19,24 @@ except ImportError as e:
     raise ImportError("Gagal import modul RRDBNet_arch dari folder ESRGAN.") from e
 
 class ESRGAN:
-    def __init__(self, model_path=None, device=None):
+    def __init__(self, model_path=None, device=None, tile_size=0, tile_overlap=16, precision='fp32',
+                 channels_last=False):
         if model_path is None:
             model_path = os.path.join(BASE_DIR, '../ESRGAN/models/RRDB_ESRGAN_x4.pth')
 
         self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        self.scale = 4
+
+        # tile_size > 0: gambar besar diproses per tile agar memori puncak terbatas
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.channels_last = channels_last
+        self.precision = precision
+        if precision not in ('fp32', 'bf16', 'fp16'):
+            raise ValueError(f"Presisi ESRGAN tidak dikenal: {precision}")
+        if precision == 'fp16' and self.device == 'cpu':
+            print("[WARNING] fp16 tidak efisien di CPU, memakai bf16")
+            self.precision = 'bf16'
 
         self.model = rrdbnet.RRDBNet(3, 3, 64, 23, gc=32)
         if not os.path.isfile(model_path):
@@ -29,23 +46,134 @@ class ESRGAN:
         self.model.load_state_dict(state_dict, strict=True)
         self.model.eval()
         self.model.to(self.device)
+        if channels_last:
+            self.model = self.model.to(memory_format=torch.channels_last)
+
+        self.last_timing = {}
+        self.timings = deque(maxlen=200)
+
+    def autocast(self):
+        if self.precision == 'fp32':
+            return contextlib.nullcontext()
+        dtype = torch.bfloat16 if self.precision == 'bf16' else torch.float16
+        return torch.autocast(device_type='cuda' if self.device.startswith('cuda') else 'cpu', dtype=dtype)
+
+    def to_tensor(self, imgs):
+        batch = np.stack(imgs).astype(np.float32) / 255.0
+        batch = np.transpose(batch[:, :, :, [2, 1, 0]], (0, 3, 1, 2))  # BGR ke RGB, NHWC ke NCHW
+        return torch.from_numpy(np.ascontiguousarray(batch)).to(self.device)
+
+    @staticmethod
+    def from_tensor(output):
+        output = output.float().cpu().clamp_(0, 1).numpy()
+        output = np.transpose(output[:, [2, 1, 0], :, :], (0, 2, 3, 1))  # RGB ke BGR
+        return (output * 255.0).round().astype(np.uint8)
+
+    def forward(self, tensor):
+        if self.channels_last:
+            tensor = tensor.contiguous(memory_format=torch.channels_last)
+        with torch.no_grad(), self.autocast():
+            return self.model(tensor).float()
+
+    def forward_tiled(self, tensor):
+        b, c, h, w = tensor.shape
+        s = self.scale
+        tile = self.tile_size
+        step = max(1, tile - self.tile_overlap)
+
+        output = torch.zeros((b, c, h * s, w * s), device=self.device)
+        weight = torch.zeros((1, 1, h * s, w * s), device=self.device)
+
+        for y in range(0, h, step):
+            y_end = min(y + tile, h)
+            y_start = max(0, y_end - tile)
+            for x in range(0, w, step):
+                x_end = min(x + tile, w)
+                x_start = max(0, x_end - tile)
+
+                patch = self.forward(tensor[:, :, y_start:y_end, x_start:x_end])
+                mask = blend_window(patch.shape[2], patch.shape[3], self.tile_overlap * s, self.device)
+                output[:, :, y_start * s:y_end * s, x_start * s:x_end * s] += patch * mask
+                weight[:, :, y_start * s:y_end * s, x_start * s:x_end * s] += mask
+
+                if x_end == w:
+                    break
+            if y_end == h:
+                break
+
+        return output / weight
+
+    def run(self, tensor):
+        h, w = tensor.shape[2:]
+        if self.tile_size and max(h, w) > self.tile_size:
+            return self.forward_tiled(tensor), 'tiled'
+        return self.forward(tensor), 'full'
 
     def enhance(self, img):
-        img = img.astype(np.float32) / 255.0
-        img = np.transpose(img[:, :, [2, 1, 0]], (2, 0, 1))  # BGR ke RGB
-        img = torch.from_numpy(img).unsqueeze(0).to(self.device).float()
-
-        with torch.no_grad():
-            output = self.model(img).squeeze(0).float().cpu().clamp_(0, 1).numpy()
-
-        output = np.transpose(output[[2, 1, 0], :, :], (1, 2, 0))  # RGB ke BGR
-        output = (output * 255.0).round().astype(np.uint8)
-        return output
-
-def apply_clahe(img):
-    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    clahe = cv2.createCLAHE(clipLimit=1.0, tileGridSize=(8, 8))
-    cl = clahe.apply(l)
-    merged = cv2.merge((cl, a, b))
-    return cv2.cvtColor(merged, cv2.COLOR_LAB2BGR)
+        start = time.perf_counter()
+        output, mode = self.run(self.to_tensor([img]))
+        result = self.from_tensor(output)[0]
+        self.record_timing(mode, 1, start)
+        return result
+
+    def enhance_batch(self, imgs, max_batch=8):
+        """Upscale beberapa crop, crop dengan shape yang persis sama diproses dalam satu tensor.
+
+        Crop tidak pernah di-pad: padding mengubah hasil di tepi kanan dan bawah crop. Crop yang shape-nya
+        tidak punya pasangan lewat enhance() biasa. Urutan hasil sama dengan input.
+        """
+        groups = {}
+        for i, img in enumerate(imgs):
+            groups.setdefault(img.shape, []).append(i)
+
+        results = [None] * len(imgs)
+        for indices in groups.values():
+            for chunk_start in range(0, len(indices), max_batch):
+                chunk = indices[chunk_start:chunk_start + max_batch]
+                if len(chunk) == 1:
+                    results[chunk[0]] = self.enhance(imgs[chunk[0]])
+                    continue
+                start = time.perf_counter()
+                output, mode = self.run(self.to_tensor([imgs[i] for i in chunk]))
+                for i, result in zip(chunk, self.from_tensor(output)):
+                    results[i] = result
+                self.record_timing(f"batch-{mode}", len(chunk), start)
+        return results
+
+    def record_timing(self, mode, batch_size, start):
+        end = time.perf_counter()
+        metrics.record("esrgan", start, end, mode=mode, precision=self.precision)
+        elapsed_ms = (end - start) * 1000.0
+        self.last_timing = {
+            "mode": mode,
+            "precision": self.precision,
+            "channels_last": self.channels_last,
+            "batch": batch_size,
+            "ms": elapsed_ms,
+            "ms_per_image": elapsed_ms / batch_size,
+        }
+        self.timings.append(self.last_timing)
+
+    def timing_summary(self):
+        summary = {}
+        for t in self.timings:
+            entry = summary.setdefault(t["mode"], {"calls": 0, "images": 0, "ms": 0.0})
+            entry["calls"] += 1
+            entry["images"] += t["batch"]
+            entry["ms"] += t["ms"]
+        for entry in summary.values():
+            entry["ms_per_image"] = entry["ms"] / entry["images"]
+        return summary
+
+
+def blend_window(h, w, overlap, device):
+    """Bobot feathering untuk menyambung tile, selalu > 0 supaya pembagi aman."""
+    def ramp(n):
+        r = torch.ones(n, device=device)
+        ov = min(overlap, n // 2)
+        if ov > 0:
+            edge = torch.linspace(1.0 / (ov + 1), 1.0, ov, device=device)
+            r[:ov] = edge
+            r[n - ov:] = torch.flip(edge, dims=[0])
+        return r
+    return (ramp(h)[:, None] * ramp(w)[None, :])[None, None]
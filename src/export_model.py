@@ -0,0 +1,54 @@
+import os
+import shutil
+import argparse
+from ultralytics import YOLO
+from src.deteksi import artifact_path
+
+
+def export_model(model_path, backend, int8=False, imgsz=640, data=None):
+    """Export sekali model .pt ke ONNX / OpenVINO, hasilnya disimpan di samping file .pt."""
+    target = artifact_path(model_path, backend, int8)
+    model = YOLO(model_path)
+
+    if backend == 'onnx':
+        onnx_fp32 = artifact_path(model_path, 'onnx', False)
+        if not os.path.exists(onnx_fp32):
+            exported = model.export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+            if os.path.abspath(exported) != os.path.abspath(onnx_fp32):
+                shutil.move(exported, onnx_fp32)
+        if int8:
+            # Kuantisasi dinamis INT8 untuk ONNX Runtime CPU
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(onnx_fp32, target, weight_type=QuantType.QUInt8)
+
+    elif backend == 'openvino':
+        kwargs = {"format": 'openvino', "imgsz": imgsz, "dynamic": True, "int8": int8}
+        if int8 and data:
+            kwargs["data"] = data  # dataset kalibrasi (yaml ultralytics)
+        exported = model.export(**kwargs)
+        if os.path.abspath(exported) != os.path.abspath(target):
+            if os.path.exists(target):
+                shutil.rmtree(target)
+            shutil.move(exported, target)
+
+    else:
+        raise ValueError(f"Backend export tidak dikenal: {backend}")
+
+    print(f"[INFO] Model {backend}{' INT8' if int8 else ''} tersimpan di: {target}")
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export model deteksi plat ke backend CPU")
+    parser.add_argument('--model', default='model/platIndo2_yolov8s.pt')
+    parser.add_argument('--backend', choices=['onnx', 'openvino'], required=True)
+    parser.add_argument('--int8', action='store_true', help="Kuantisasi bobot ke INT8")
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--data', default=None, help="Dataset kalibrasi untuk INT8 OpenVINO")
+    args = parser.parse_args()
+
+    export_model(args.model, args.backend, int8=args.int8, imgsz=args.imgsz, data=args.data)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,47 +1,29 @@
 import cv2
-import torch
 import time
+import numpy as np
 import queue
-from datetime import datetime, timedelta
+from collections import deque
+from datetime import datetime
 from PIL import Image, ImageTk
-from src.db import ParkingDatabase
-from src.deteksi import PlateDetector
-from src.cache import PlateCache
-from src.utils import format_duration, is_same_crop
-from src.ocr_worker import OcrWorker
-from src.camera import Camera
+from src.table_model import SessionTableModel, format_row, is_open
 class MParkingApp:
+    """Client Tkinter untuk GateService: menampilkan satu lane masuk dan satu lane keluar.
 
-    def __init__(self, root):
-        self.root = root
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.detector = PlateDetector(device=self.device)
-        self.db = ParkingDatabase()
-
-        self.cap_in = None
-        self.cap_out = None
-
-        self.frame_width = 640
-        self.frame_height = 360
-
-        self.prev_time_in = None
-        self.prev_time_out = None
-        self.camera_thread_in = None
-        self.camera_thread_out = None
-        self.last_ocr_crop_in = None
-        self.last_ocr_text_in = None
-        self.last_ocr_time_in = 0
-        self.ocr_skipped_in = False
+    Semua proses (kamera, deteksi, OCR, database) berjalan di service, UI hanya merender hasilnya.
+    """
 
-        self.last_ocr_crop_out = None
-        self.last_ocr_text_out = None
-        self.last_ocr_time_out = 0
-        self.ocr_skipped_out = False
-
-        self.ocr_interval_seconds = 3
+    def __init__(self, root, service, display_fps=15):
+        self.root = root
+        self.service = service
+        self.device_shown = False
+        # Kecepatan render kanvas, terpisah dari FPS kamera dan deteksi
+        self.display_interval = max(1, int(1000 / display_fps))
+        self.db = service.db
 
-        self.plate_cache_in = PlateCache()
-        self.plate_cache_out = PlateCache()
+        self.frame_width = service.frame_width
+        self.frame_height = service.frame_height
+        self.lane_in = service.lane_for(is_entry=True)
+        self.lane_out = service.lane_for(is_entry=False)
 
         self.roi_manager = None
 
@@ -58,307 +40,248 @@ class MParkingApp:
         self.fps_in_label = None
         self.fps_out_label = None
         self.tree = None
-        self.imgtk_in = None
-        self.imgtk_out = None
+        self.history = None
+        self.table_model = SessionTableModel()
+        self.table_tags_configured = False
+        # Satu item image + PhotoImage per kanvas, pixel-nya di-update lewat paste()
+        self.canvas_images = {}
+        self.canvas_messages = {}
+        self.rgb_buffers = {}
         self.running = True
 
-        # Queues for OCR communication
-        self.ocr_queue = queue.Queue()
-        self.ocr_result_queue = queue.Queue()
+        self.pipeline = service.pipeline
+        self.last_seq_in = 0
+        self.last_seq_out = 0
+        # Latensi capture -> tampil di kanvas, terpisah dari FPS kamera
+        self.display_latency = {True: deque(maxlen=30), False: deque(maxlen=30)}
 
-        # Start OCR worker thread
-        self.ocr_worker = OcrWorker(self.ocr_queue, self.ocr_result_queue)
-        self.ocr_worker.start()
+        # Event plat dari service, diambil UI thread lewat root.after
+        self.events = service.subscribe()
+        self.root.after(100, self.check_events)
 
-        # Schedule OCR result checking
-        self.root.after(100, self.check_ocr_result)
+    def device_text(self):
+        if not self.service.pipeline.ready:
+            return "Memuat model deteksi..."
+        return f"Running on {'GPU' if self.service.device == 'cuda' else 'cpu'}"
 
-        self.update_table()
+    def lane(self, is_entry):
+        return self.lane_in if is_entry else self.lane_out
 
     def set_camera_sources(self, source_in, source_out):
-        def parse_source(src):
-            if src.isdigit():
-                return int(src)
-            return src
-
-        if source_in:
-            new_cap_in = cv2.VideoCapture(parse_source(source_in))
-            if new_cap_in.isOpened():
-                if self.cap_in is not None:
-                    self.cap_in.release()
-                    time.sleep(0.5)
-                self.cap_in = new_cap_in
-                self.camera_thread_in = Camera(
-                    cap_getter=lambda: self.cap_in,
-                    frame_setter=lambda frame: setattr(self, 'latest_frame_in', frame),
-                    error_callback=lambda: self.display_message_on_canvas(True, "Tidak bisa baca frame Kamera Masuk")
-                )
-
-                self.camera_thread_in.start()
-                print(f"[INFO] Kamera Masuk di-set ke: {source_in}")
-                if self.canvas_in:
-                    self.canvas_in.delete("all")
-            else:
-                print(f"[WARNING] Gagal buka Kamera Masuk: {source_in}")
-
-        if source_out:
-            new_cap_out = cv2.VideoCapture(parse_source(source_out))
-            if new_cap_out.isOpened():
-                if self.cap_out is not None:
-                    self.cap_out.release()
-                    time.sleep(0.5)
-                self.cap_out = new_cap_out
-                self.camera_thread_out = Camera(
-                    cap_getter=lambda: self.cap_out,
-                    frame_setter=lambda frame: setattr(self, 'latest_frame_out', frame),
-                    error_callback=lambda: self.display_message_on_canvas(False, "Tidak bisa baca frame Kamera Keluar")
-                )
-
-                self.camera_thread_out.start()
-                print(f"[INFO] Kamera Keluar di-set ke: {source_out}")
-                if self.canvas_out:
-                    self.canvas_out.delete("all")
-            else:
-                print(f"[WARNING] Gagal buka Kamera Keluar: {source_out}")
-            return
+        if source_in and self.lane_in is not None:
+            if self.service.set_source(self.lane_in.name, source_in):
+                self.clear_message(self.canvas_in)
+
+        if source_out and self.lane_out is not None:
+            if self.service.set_source(self.lane_out.name, source_out):
+                self.clear_message(self.canvas_out)
 
-    def check_ocr_result(self):
+    def on_roi_change(self, stream_type, roi):
+        lane = self.lane(stream_type == 'in')
+        if lane is not None:
+            self.service.set_roi(lane.name, roi)
+
+    def check_events(self):
         try:
             while True:
-                is_entry, plate_text, enhanced_plate = self.ocr_result_queue.get_nowait()
-                self.handle_ocr_result(is_entry, plate_text, enhanced_plate)
+                event = self.events.get_nowait()
+                self.handle_event(event)
         except queue.Empty:
             pass
-        self.root.after(100, self.check_ocr_result)
-
-    def handle_ocr_result(self, is_entry, plate_text, enhanced_plate):
-        last_ocr_text_attr = 'last_ocr_text_in' if is_entry else 'last_ocr_text_out'
-        last_ocr_time_attr = 'last_ocr_time_in' if is_entry else 'last_ocr_time_out'
-        ocr_skipped_flag = 'ocr_skipped_in' if is_entry else 'ocr_skipped_out'
-
-        if plate_text:
-            setattr(self, last_ocr_text_attr, plate_text)
-            setattr(self, ocr_skipped_flag, False)
-            setattr(self, last_ocr_time_attr, time.time())
-
-            plate_cache = self.plate_cache_in if is_entry else self.plate_cache_out
-            if not plate_cache.is_recent(plate_text):
-                try:
-                    if is_entry:
-                        self.db.insert_entry(plate_text, datetime.now())
-                    else:
-                        self.db.update_exit(plate_text)
-                    plate_cache.update(plate_text)
-                except Exception as e:
-                    print(f"[ERROR] Gagal update DB {'masuk' if is_entry else 'keluar'}: {e}")
-
-            preview_label = self.preview_crop_in if is_entry else self.preview_crop_out
-            preview_attr = 'preview_crop_in_img' if is_entry else 'preview_crop_out_img'
-            if enhanced_plate is not None and preview_label:
-                self.update_preview_crop(preview_label, enhanced_plate, preview_attr)
-
-        else:
-            setattr(self, ocr_skipped_flag, True)
-
-    def handle_plate_detection(self, det, is_entry, last_ocr_time_attr, last_ocr_crop_attr, last_ocr_text_attr):
-        now = time.time()
-
-        bbox = det["bbox"]
-        conf = det["confidence"]
-
-        last_ocr_time = getattr(self, last_ocr_time_attr)
-        last_ocr_crop = getattr(self, last_ocr_crop_attr)
-        last_ocr_text = getattr(self, last_ocr_text_attr)
-
-        do_ocr = False
-        if now - last_ocr_time > self.ocr_interval_seconds:
-            if last_ocr_crop is None or not is_same_crop(last_ocr_crop, det["cropped_plate"]):
-                do_ocr = True
+        self.root.after(100, self.check_events)
 
-        ocr_skipped_flag = 'ocr_skipped_in' if is_entry else 'ocr_skipped_out'
-
-        if do_ocr:
-            self.ocr_queue.put((is_entry, det["cropped_plate"]))
-            setattr(self, last_ocr_crop_attr, det["cropped_plate"].copy())
-            setattr(self, ocr_skipped_flag, False)
-            setattr(self, last_ocr_time_attr, now)
+    def handle_event(self, event):
+        lane = self.service.lanes.get(event["lane"])
+        if lane is None or lane not in (self.lane_in, self.lane_out):
+            return
+        is_entry = lane is self.lane_in
+        preview_label = self.preview_crop_in if is_entry else self.preview_crop_out
+        preview_attr = 'preview_crop_in_img' if is_entry else 'preview_crop_out_img'
+        if lane.last_enhanced is not None and preview_label:
+            self.update_preview_crop(preview_label, lane.last_enhanced, preview_attr)
+
+    def process_stream(self, is_entry):
+        lane = self.lane(is_entry)
+        if lane is None:
+            self.display_message_on_canvas(is_entry, f"Lane {'masuk' if is_entry else 'keluar'} tidak dikonfigurasi")
+            return
 
+        preview_crop = lane.pending_preview
+        if preview_crop is not None:
+            lane.pending_preview = None
             preview_label = self.preview_crop_in if is_entry else self.preview_crop_out
             preview_attr = 'preview_crop_in_img' if is_entry else 'preview_crop_out_img'
-            self.update_preview_crop(preview_label, det["cropped_plate"], preview_attr)
-
-            plate_text = last_ocr_text or "..."
-        else:
-            plate_text = last_ocr_text or "..."
-            if not getattr(self, ocr_skipped_flag):
-                setattr(self, ocr_skipped_flag, True)
-
-        return bbox, conf, plate_text
+            self.update_preview_crop(preview_label, preview_crop, preview_attr)
 
-    def process_stream(self, roi_attr, last_ocr_time_attr, last_ocr_crop_attr, last_ocr_text_attr
-                      , is_entry):
-        frame = getattr(self, 'latest_frame_in' if is_entry else 'latest_frame_out', None)
-        roi_val = getattr(self.roi_manager, roi_attr)
+        result = self.pipeline.get_result(lane.name)
 
-
-        if frame is None:
+        if result is None:
             self.display_message_on_canvas(is_entry, f"Tidak bisa baca frame Kamera {'Masuk' if is_entry else 'Keluar'}")
             return
 
-        frame_resized = cv2.resize(frame, (self.frame_width, self.frame_height))
-        plates = self.detector.detect(frame_resized, roi=roi_val)
-        self.draw_roi(frame_resized, roi_val, stream_type='in' if is_entry else 'out')
-
-        for det in plates:
-            bbox, conf, plate_text = self.handle_plate_detection(det, is_entry,
-                                                                 last_ocr_time_attr,
-                                                                 last_ocr_crop_attr,
-                                                                 last_ocr_text_attr)
-            color = (0, 255, 0) if is_entry else (0, 0, 255)
-            cv2.rectangle(frame_resized, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
-            conf_text = f"{conf:.2f}"
-            cv2.putText(frame_resized, conf_text, (bbox[0], bbox[1] - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-
+        last_seq_attr = 'last_seq_in' if is_entry else 'last_seq_out'
+        if result["seq"] == getattr(self, last_seq_attr):
+            return
+        setattr(self, last_seq_attr, result["seq"])
 
         canvas = self.canvas_in if is_entry else self.canvas_out
         if canvas:
-            self.show_frame(frame_resized, canvas)
+            self.show_frame(result["frame"], canvas)
+            self.display_latency[is_entry].append(time.perf_counter() - result["frame_time"])
 
     def on_close(self):
         self.running = False
-        if self.cap_in:
-            self.cap_in.release()
-        if self.cap_out:
-            self.cap_out.release()
-        if self.camera_thread_in:
-            self.camera_thread_in.stop()
-        if self.camera_thread_out:
-            self.camera_thread_out.stop()
+        self.service.unsubscribe(self.events)
+        # Service dihentikan main.py setelah mainloop selesai
         self.root.destroy()
 
+    def is_visible(self):
+        try:
+            return self.root.state() != 'iconic' and self.root.winfo_viewable()
+        except Exception:
+            return False
+
     def update_streams(self):
-        # Kalau thread kamera sudah berhenti karena error, langsung tampilkan pesan error
-        if self.camera_thread_in and not self.camera_thread_in.running:
-            self.display_message_on_canvas(True, "Tidak bisa baca frame Kamera Masuk")
-        else:
-            self.process_stream(
-                roi_attr='roi_masuk',
-                last_ocr_time_attr='last_ocr_time_in',
-                last_ocr_crop_attr='last_ocr_crop_in',
-                last_ocr_text_attr='last_ocr_text_in',
-                is_entry=True
-            )
-
-        if self.camera_thread_out and not self.camera_thread_out.running:
-            self.display_message_on_canvas(False, "Tidak bisa baca frame Kamera Keluar")
-        else:
-            self.process_stream(
-                roi_attr='roi_keluar',
-                last_ocr_time_attr='last_ocr_time_out',
-                last_ocr_crop_attr='last_ocr_crop_out',
-                last_ocr_text_attr='last_ocr_text_out',
-                is_entry=False
-            )
-        # Update label FPS dari camera thread langsung (lebih akurat)
-        if self.camera_thread_in and self.fps_in_label:
-            fps_in = getattr(self.camera_thread_in, 'current_fps', 0)
-            self.fps_in_label.config(text=f"FPS Masuk: {fps_in:.1f}")
-
-        if self.camera_thread_out and self.fps_out_label:
-            fps_out = getattr(self.camera_thread_out, 'current_fps', 0)
-            self.fps_out_label.config(text=f"FPS Keluar: {fps_out:.1f}")
-
-        self.root.after(30, self.update_streams)
+        # Jendela di-minimize / tersembunyi: tidak ada yang perlu dirender
+        if not self.is_visible():
+            self.root.after(self.display_interval * 4, self.update_streams)
+            return
+
+        if not self.device_shown and self.cuda_label and self.service.pipeline.ready:
+            self.cuda_label.config(text=self.device_text())
+            self.device_shown = True
+
+        ocr_depth = self.service.ocr_pool.queue.depth()
+        for is_entry, label_widget, label in ((True, self.fps_in_label, "Masuk"),
+                                              (False, self.fps_out_label, "Keluar")):
+            lane = self.lane(is_entry)
+            # Kalau thread kamera sudah berhenti karena error, langsung tampilkan pesan error
+            if lane is not None and lane.error:
+                self.display_message_on_canvas(is_entry, f"Tidak bisa baca frame Kamera {label}")
+            elif lane is not None and lane.camera and not lane.camera.connected:
+                self.display_message_on_canvas(is_entry, f"Menyambung ulang Kamera {label}...")
+            else:
+                self.process_stream(is_entry)
+
+            # Update label FPS dari camera thread langsung (lebih akurat)
+            if lane is not None and lane.camera and label_widget:
+                fps = getattr(lane.camera, 'current_fps', 0)
+                samples = self.display_latency[is_entry]
+                display_ms = (sum(samples) / len(samples) * 1000.0) if samples else 0.0
+                stats = self.pipeline.stats(lane.name)
+                stats["crop_cache_hit_rate"] = lane.crop_cache.stats()["hit_rate"]
+                label_widget.config(text=self.format_lane_status(label, fps, stats, ocr_depth.get(lane.name, 0),
+                                                                 display_ms))
+
+        self.root.after(self.display_interval, self.update_streams)
 
     def display_message_on_canvas(self, is_entry, message):
         canvas = self.canvas_in if is_entry else self.canvas_out
-        if canvas:
-            canvas.delete("all")
-            canvas.create_text(self.frame_width // 2, self.frame_height // 2,
-                               text=message,
-                               fill="white", font=("Helvetica", 16))
+        if not canvas or self.canvas_messages.get(canvas) == message:
+            return
+        # Frame terakhir disembunyikan, bukan dihapus, supaya item image bisa dipakai lagi
+        image = self.canvas_images.get(canvas)
+        if image is not None:
+            canvas.itemconfigure(image[0], state='hidden')
+        canvas.delete("message")
+        canvas.create_text(self.frame_width // 2, self.frame_height // 2,
+                           text=message,
+                           fill="white", font=("Helvetica", 16), tags="message")
+        self.canvas_messages[canvas] = message
+
+    def clear_message(self, canvas):
+        if canvas and self.canvas_messages.pop(canvas, None) is not None:
+            canvas.delete("message")
 
     def update_preview_crop(self, label_widget, image_np, attr_name):
         img_rgb = cv2.cvtColor(image_np, cv2.COLOR_BGR2RGB)
         img_pil = Image.fromarray(img_rgb)
         img_pil = img_pil.resize((200, 60))
-        photo_img = ImageTk.PhotoImage(img_pil)
-        setattr(self, attr_name, photo_img)
-        if label_widget:
-            label_widget.config(image=photo_img)
+        photo_img = getattr(self, attr_name)
+        if photo_img is None:
+            photo_img = ImageTk.PhotoImage(img_pil)
+            setattr(self, attr_name, photo_img)
+            if label_widget:
+                label_widget.config(image=photo_img)
+        else:
+            photo_img.paste(img_pil)
 
     @staticmethod
-    def draw_roi(frame, roi, stream_type='in', thickness=2):
-
-        x1, y1, x2, y2 = roi
-        color = (255, 0, 0) if stream_type == 'in' else (0, 0, 255)
-        cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
+    def format_lane_status(label, fps, stats, ocr_depth=0, display_ms=0.0):
+        motion = stats.get('motion')
+        if stats.get('state') == 'warming':
+            state = " | Warming"
+        elif motion is None:
+            state = ""
+        else:
+            state = " | Aktif" if motion["active"] else f" | Idle ({motion['skipped_ratio'] * 100:.0f}% dilewati)"
+        return (f"FPS {label}: {fps:.1f} | Latensi: {stats.get('latency_ms', 0):.0f} ms"
+                f" | Tampil: {display_ms:.0f} ms | Antrian: {stats.get('queue_depth', 0)} | OCR: {ocr_depth}"
+                f" (cache {stats.get('crop_cache_hit_rate', 0) * 100:.0f}%){state}")
 
     def show_frame(self, frame, canvas):
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        imgtk = ImageTk.PhotoImage(image=Image.fromarray(frame_rgb))
-        if canvas == self.canvas_in:
-            self.imgtk_in = imgtk
+        # Konversi warna ke buffer RGB yang dipakai ulang per kanvas
+        frame_rgb = self.rgb_buffers.get(canvas)
+        if frame_rgb is None or frame_rgb.shape != frame.shape:
+            frame_rgb = self.rgb_buffers[canvas] = np.empty_like(frame)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame_rgb)
+        image = Image.fromarray(frame_rgb)
+
+        item = self.canvas_images.get(canvas)
+        if item is None or not canvas.type(item[0]) or item[1].width() != image.width \
+                or item[1].height() != image.height:
+            if item is not None:
+                canvas.delete(item[0])
+            photo = ImageTk.PhotoImage(image=image)
+            item_id = canvas.create_image(0, 0, anchor='nw', image=photo, tags="frame")
+            # Overlay ROI dari ROIManager selalu di atas frame
+            canvas.tag_lower(item_id)
+            self.canvas_images[canvas] = (item_id, photo)
         else:
-            self.imgtk_out = imgtk
-        canvas.create_image(0, 0, anchor='nw', image=imgtk)
+            item_id, photo = item
+            photo.paste(image)
+            canvas.itemconfigure(item_id, state='normal')
+        self.clear_message(canvas)
 
     def update_table(self):
-        records = self.db.fetch_all_entries()
-        records.sort(key=lambda x: x.get('waktu_masuk', datetime.min), reverse=True)
         if self.tree:
-            self.tree.delete(*self.tree.get_children())
-
-            max_duration = timedelta(hours=3)
-
-            for entry in records:
-                plat_nomor = entry.get('plat_nomor', 'Tidak Dikenal')
-                if plat_nomor == 'Tidak Dikenal':
-                    continue
-
-                waktu_masuk = entry.get('waktu_masuk', '-')
-                waktu_keluar = entry.get('waktu_keluar', '-')
-
-                if isinstance(waktu_masuk, datetime):
-                    waktu_masuk_str = waktu_masuk.strftime('%H:%M')
-                    tanggal_str = waktu_masuk.strftime('%d/%m/%Y')
-                else:
-                    waktu_masuk_str = waktu_masuk
-                    tanggal_str = '-'
-
-                if isinstance(waktu_keluar, datetime):
-                    waktu_keluar_str = waktu_keluar.strftime('%H:%M')
-                else:
-                    waktu_keluar_str = '-'
-
-                if waktu_masuk and isinstance(waktu_masuk, datetime):
-                    end_time = waktu_keluar if isinstance(waktu_keluar, datetime) else datetime.now()
-                    durasi_td = end_time - waktu_masuk
-                    durasi_str = format_duration(durasi_td)
-                    is_overdue = durasi_td > max_duration
-                else:
-                    durasi_str = "-"
-                    is_overdue = False
-
-                row_id = self.tree.insert('', 'end',
-                                          values=(tanggal_str, plat_nomor, waktu_masuk_str, waktu_keluar_str,
-                                                  durasi_str))
-
-                if waktu_masuk != '-':
-                    self.tree.item(row_id, tags=('green',))
-
-                if waktu_keluar_str == '-':
-                    if is_overdue:
-                        self.tree.item(row_id, tags=('overdue',))
-                else:
-                    if is_overdue:
-                        self.tree.item(row_id, tags=('overdue',))
-                    else:
-                        self.tree.item(row_id, tags=('ontime',))
-
-            self.tree.tag_configure('green', foreground='#006D5B')
-            self.tree.tag_configure('overdue', foreground='white', background='#800000')
-            self.tree.tag_configure('ontime', foreground='white', background='#0F52BA')
-
-        self.root.after(3000, self.update_table)
\ No newline at end of file
+            if not self.table_tags_configured:
+                self.tree.tag_configure('green', foreground='#006D5B')
+                self.tree.tag_configure('overdue', foreground='white', background='#800000')
+                self.tree.tag_configure('ontime', foreground='white', background='#0F52BA')
+                self.table_tags_configured = True
+
+            added, changed, removed = self.table_model.refresh(self.db)
+            now = datetime.now()
+
+            for iid in removed:
+                if self.tree.exists(iid):
+                    self.tree.delete(iid)
+
+            # Baris baru disisipkan langsung di posisinya, baris lama tidak disentuh
+            for iid in sorted(added, key=self.table_model.index_of):
+                values, tags = format_row(self.table_model.entries[iid], now)
+                self.tree.insert('', self.table_model.index_of(iid), iid=iid, values=values, tags=tags)
+
+            for iid in changed:
+                values, tags = format_row(self.table_model.entries[iid], now)
+                self.tree.item(iid, values=values, tags=tags)
+
+            self.refresh_visible_durations(now)
+
+        self.root.after(3000, self.update_table)
+
+    def refresh_visible_durations(self, now):
+        """Durasi live hanya dihitung ulang untuk sesi aktif yang sedang terlihat di tabel."""
+        children = self.tree.get_children()
+        if not children:
+            return
+        first, last = self.tree.yview()
+        start = max(0, int(first * len(children)))
+        end = min(len(children), int(last * len(children)) + 1)
+        for iid in children[start:end]:
+            entry = self.table_model.entries.get(iid)
+            if entry is None or not is_open(entry):
+                continue
+            values, tags = format_row(entry, now)
+            self.tree.item(iid, values=values, tags=tags)
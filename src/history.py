@@ -0,0 +1,126 @@
+from collections import deque
+from datetime import datetime, timedelta
+from src.storage import ASCENDING, DESCENDING
+from src.table_model import format_row
+
+
+def parse_date(text):
+    text = text.strip()
+    if not text:
+        return None
+    return datetime.strptime(text, '%d/%m/%Y')
+
+
+class HistoryController:
+    """Riwayat parkir ter-paginasi. Treeview hanya menyimpan beberapa halaman di sekitar posisi scroll,
+    halaman berikutnya / sebelumnya diambil dari database saat scroll mendekati ujung."""
+
+    def __init__(self, root, db, tree, scrollbar, page_size=50, max_pages=4):
+        self.root = root
+        self.db = db
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+        self.filter = {}
+        self.pages = deque()  # list iid per halaman, urut seperti di Treeview
+        self.keys = {}  # iid -> (waktu_masuk, _id) untuk cursor
+        self.next_cursor = None
+        self.has_previous = False
+        self.loading = False
+
+        self.tree.configure(yscrollcommand=self.on_scroll)
+
+    def search(self, plate_prefix='', start_text='', end_text=''):
+        try:
+            start = parse_date(start_text)
+            end = parse_date(end_text)
+        except ValueError:
+            print("[WARNING] Format tanggal riwayat harus dd/mm/yyyy")
+            return
+        if end is not None:
+            end += timedelta(days=1)  # tanggal akhir ikut dihitung
+
+        self.filter = {"plate_prefix": plate_prefix, "start": start, "end": end}
+        self.tree.delete(*self.tree.get_children())
+        self.pages.clear()
+        self.keys.clear()
+        self.has_previous = False
+
+        entries, self.next_cursor = self.db.find_page(self.filter, DESCENDING, None, self.page_size)
+        self.pages.append(self.insert_rows(entries, 'end'))
+
+    def insert_rows(self, entries, index):
+        now = datetime.now()
+        iids = []
+        for offset, entry in enumerate(entries):
+            iid = str(entry['_id'])
+            values, tags = format_row(entry, now)
+            position = 'end' if index == 'end' else index + offset
+            self.tree.insert('', position, iid=iid, values=values, tags=tags)
+            self.keys[iid] = (entry['waktu_masuk'], entry['_id'])
+            iids.append(iid)
+        return iids
+
+    def drop_page(self, first=True):
+        page = self.pages.popleft() if first else self.pages.pop()
+        self.tree.delete(*page)
+        for iid in page:
+            self.keys.pop(iid, None)
+
+    def first_visible(self):
+        children = self.tree.get_children()
+        if not children:
+            return None
+        first, _ = self.tree.yview()
+        return children[min(len(children) - 1, int(first * len(children)))]
+
+    def load_next(self):
+        anchor = self.first_visible()
+        entries, self.next_cursor = self.db.find_page(self.filter, DESCENDING, self.next_cursor, self.page_size)
+        if entries:
+            self.pages.append(self.insert_rows(entries, 'end'))
+        if len(self.pages) > self.max_pages:
+            self.drop_page(first=True)
+            self.has_previous = True
+            if anchor and self.tree.exists(anchor):
+                self.tree.see(anchor)
+
+    def load_previous(self):
+        if not self.pages or not self.pages[0]:
+            self.has_previous = False
+            return
+        anchor = self.first_visible()
+        cursor = self.keys[self.pages[0][0]]
+        entries, _ = self.db.find_page(self.filter, ASCENDING, cursor, self.page_size)
+        if len(entries) < self.page_size:
+            self.has_previous = False
+        if entries:
+            entries.reverse()
+            self.pages.appendleft(self.insert_rows(entries, 0))
+        if len(self.pages) > self.max_pages:
+            self.drop_page(first=False)
+            last_iid = self.pages[-1][-1]
+            self.next_cursor = self.keys[last_iid]
+        if anchor and self.tree.exists(anchor):
+            self.tree.see(anchor)
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.loading:
+            return
+        if float(last) >= 0.95 and self.next_cursor is not None:
+            self.schedule(self.load_next)
+        elif float(first) <= 0.05 and self.has_previous:
+            self.schedule(self.load_previous)
+
+    def schedule(self, loader):
+        self.loading = True
+
+        def run():
+            try:
+                loader()
+            finally:
+                self.loading = False
+        self.root.after_idle(run)
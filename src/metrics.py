@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import threading
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+PREFIX = 'mpark_'
+# Batas bucket histogram latensi dalam detik
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bucket untuk ukuran batch (jumlah frame / crop / event)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def format_labels(key, extra=None):
+    items = list(key) + (list(extra) if extra else [])
+    if not items:
+        return ''
+    body = ','.join('{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                    for k, v in items)
+    return '{' + body + '}'
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Counter, gauge, dan histogram in-memory plus ring buffer trace untuk Chrome tracing.
+
+    Semua nilai tinggal di proses ini; dibaca lewat render_prometheus() / chrome_trace(),
+    mis. dari endpoint /metrics dan /trace di src/api.py. Label harus bernilai sedikit (lane, stage,
+    tier); nilai yang berubah-ubah seperti ukuran batch dikirim lewat `args` (hanya masuk trace)
+    atau histogram ukuran sendiri.
+    """
+
+    def __init__(self, trace_seconds=30.0, max_trace_events=200000):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)  # (nama, label) -> nilai
+        self.gauges = {}
+        self.histograms = {}
+        self.trace_seconds = trace_seconds
+        self.trace = deque(maxlen=max_trace_events)
+        self.tracing = trace_seconds > 0
+        self.origin = time.perf_counter()
+
+    def configure(self, trace_seconds=None, max_trace_events=None):
+        """trace_seconds 0 mematikan trace, histogram dan counter tetap jalan."""
+        with self.lock:
+            if trace_seconds is not None:
+                self.trace_seconds = trace_seconds
+                self.tracing = trace_seconds > 0
+            if max_trace_events is not None:
+                self.trace = deque(self.trace, maxlen=max_trace_events)
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            self.counters[(name, label_key(labels))] += value
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, label_key(labels))] = value
+
+    def observe(self, name, value, buckets=BUCKETS, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def record(self, name, start, end, args=None, **labels):
+        """Satu span: masuk histogram `<name>_seconds` dan (kalau aktif) trace. `args` hanya untuk trace."""
+        self.observe(f"{name}_seconds", end - start, **labels)
+        if self.tracing:
+            details = dict(labels, **args) if args else labels
+            with self.lock:
+                self.trace.append((name, start, end, threading.get_ident(), details))
+                # Buang span yang lebih tua dari jendela trace
+                cutoff = end - self.trace_seconds
+                while self.trace and self.trace[0][2] < cutoff:
+                    self.trace.popleft()
+
+    @contextmanager
+    def timer(self, name, args=None, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), args, **labels)
+
+    def timed(self, name, **labels):
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, start, time.perf_counter(), **labels)
+            return wrapper
+        return decorator
+
+    def render_prometheus(self):
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {key: (list(h.buckets), list(h.counts), h.sum, h.count)
+                          for key, h in self.histograms.items()}
+
+        lines = []
+        for kind, values in (('counter', counters), ('gauge', gauges)):
+            seen = set()
+            for (name, labels), value in sorted(values.items()):
+                metric = PREFIX + name
+                if metric not in seen:
+                    lines.append(f"# TYPE {metric} {kind}")
+                    seen.add(metric)
+                lines.append(f"{metric}{format_labels(labels)} {value}")
+
+        seen = set()
+        for (name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            metric = PREFIX + name
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} histogram")
+                seen.add(metric)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{format_labels(labels, [('le', repr(bound))])} {cumulative}")
+            lines.append(f"{metric}_bucket{format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def chrome_trace(self, seconds=None):
+        """Span beberapa detik terakhir dalam format Chrome trace (buka di chrome://tracing / Perfetto)."""
+        now = time.perf_counter()
+        cutoff = now - (seconds if seconds else self.trace_seconds)
+        with self.lock:
+            spans = [span for span in self.trace if span[2] >= cutoff]
+
+        pid = os.getpid()
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        events = []
+        for tid in {span[3] for span in spans}:
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                           "args": {"name": thread_names.get(tid, str(tid))}})
+        for name, start, end, tid, labels in spans:
+            events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": labels,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump_trace(self, path, seconds=None):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(seconds), f, default=str)
+        print(f"[INFO] Trace {seconds or self.trace_seconds:.0f} s terakhir ditulis ke {path}")
+
+
+# Registry bawaan proses, dipakai langsung oleh modul lain
+REGISTRY = Registry()
+inc = REGISTRY.inc
+set_gauge = REGISTRY.set_gauge
+observe = REGISTRY.observe
+record = REGISTRY.record
+timer = REGISTRY.timer
+timed = REGISTRY.timed
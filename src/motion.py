@@ -0,0 +1,78 @@
+import time
+import cv2
+
+
+class MotionGate:
+    """Filter murah sebelum YOLO: frame differencing pada ROI grayscale yang diperkecil.
+
+    Lane dianggap aktif sejak frame pertama yang berubah, dan tetap aktif selama `hold_seconds`
+    setelah gerakan terakhir supaya kendaraan yang berhenti di depan gate tetap terbaca.
+    """
+
+    def __init__(self, width=96, threshold=25, min_changed_ratio=0.01, hold_seconds=2.0, blur=5):
+        self.width = width
+        self.threshold = threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.hold_seconds = hold_seconds
+        self.blur = blur
+
+        self.previous = None
+        self.previous_roi = None
+        self.active_until = 0.0
+        self.active = True
+        self.changed_ratio = 0.0
+
+        self.frames = 0
+        self.skipped = 0
+
+    def prepare(self, frame, roi):
+        if roi:
+            x1, y1, x2, y2 = roi
+            frame = frame[y1:y2, x1:x2]
+        h, w = frame.shape[:2]
+        if h == 0 or w == 0:
+            return None
+        height = max(1, int(h * self.width / w))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (self.blur, self.blur), 0)
+
+    def update(self, frame, roi, now=None):
+        """Return True kalau frame ini perlu dideteksi."""
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+
+        current = self.prepare(frame, roi)
+        if current is None:
+            self.skipped += 1
+            return False
+
+        # Frame pertama atau ROI baru digeser: belum ada pembanding, anggap ada gerakan
+        if self.previous is None or roi != self.previous_roi or current.shape != self.previous.shape:
+            self.changed_ratio = 1.0
+        else:
+            diff = cv2.absdiff(current, self.previous)
+            _, mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+            self.changed_ratio = cv2.countNonZero(mask) / mask.size
+        self.previous = current
+        self.previous_roi = roi
+
+        if self.changed_ratio >= self.min_changed_ratio:
+            self.active_until = now + self.hold_seconds
+        self.active = now < self.active_until
+        if not self.active:
+            self.skipped += 1
+        return self.active
+
+    def keep_alive(self, now=None):
+        """Tahan lane tetap aktif, mis. selama tracker masih punya kendaraan."""
+        now = time.monotonic() if now is None else now
+        self.active_until = max(self.active_until, now + self.hold_seconds)
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "changed_ratio": self.changed_ratio,
+            "skipped": self.skipped,
+            "skipped_ratio": self.skipped / self.frames if self.frames else 0.0,
+        }
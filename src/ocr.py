@@ -1,29 +1,149 @@
+import os
 import cv2
-import pytesseract
 import re
-from src.ersgan import ESRGAN, apply_clahe
+import threading
+import numpy as np
+from src import metrics
+from src.utils import apply_clahe
+from src.ocr_engine import create_engine
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SR_MODEL_PATH = os.path.join(BASE_DIR, '../model/FSRCNN_x4.pb')
+
+
+def load_light_sr(model_path=SR_MODEL_PATH, scale=4):
+    """Super-resolution ringan (FSRCNN) lewat cv2.dnn_superres, butuh opencv-contrib."""
+    if not hasattr(cv2, 'dnn_superres') or not os.path.isfile(model_path):
+        return None
+    sr = cv2.dnn_superres.DnnSuperResImpl_create()
+    sr.readModel(model_path)
+    sr.setModel('fsrcnn', scale)
+    return sr
+
 
 class PlateOCR:
-    def __init__(self):
-        pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-        self.tesseract_config = r'-c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 --psm 8 --oem 3'
+    def __init__(self, upscale_below_height=64, target_height=128, use_light_sr=True, esrgan_fallback=True,
+                 engine=None):
+        # Engine OCR dipilih lewat argumen / env MPARK_OCR_ENGINE, model tetap dimuat antar panggilan.
+        # Satu engine per thread, sedangkan model enhancement dipakai bersama.
+        self.engine_name = engine
+        self.local = threading.local()
+        self.local.engine = create_engine(engine)
+        self.model_lock = threading.Lock()
         self.pattern = re.compile(r'^[A-Z0-9]{1,8}$')
-        self.esrgan = ESRGAN()
 
-    def preprocess_ocr(self, img):
-        enhanced = self.esrgan.enhance(img)
-        enhanced_clahe = apply_clahe(enhanced)
-        gray = cv2.cvtColor(enhanced_clahe, cv2.COLOR_BGR2GRAY)
+        # Crop yang lebih tinggi dari ini tidak di-upscale sama sekali
+        self.upscale_below_height = upscale_below_height
+        self.target_height = target_height
+
+        self.light_sr = load_light_sr() if use_light_sr else None
+        self.esrgan_fallback = esrgan_fallback
+        self.esrgan = None  # ESRGAN hanya dimuat kalau tier murah gagal
+
+        self.tiers = ['cheap']
+        if self.light_sr is not None:
+            self.tiers.append('sr')
+        if esrgan_fallback:
+            self.tiers.append('esrgan')
+
+    @property
+    def engine(self):
+        engine = getattr(self.local, 'engine', None)
+        if engine is None:
+            engine = create_engine(self.engine_name)
+            self.local.engine = engine
+        return engine
+
+    def needs_upscale(self, img):
+        return img.shape[0] < self.upscale_below_height
+
+    def get_esrgan(self):
+        if self.esrgan is None:
+            with self.model_lock:
+                if self.esrgan is None:
+                    # torch baru di-import saat ESRGAN benar-benar dibutuhkan
+                    from src.ersgan import ESRGAN
+                    self.esrgan = ESRGAN()
+        return self.esrgan
+
+    def warmup(self, preload_esrgan=False):
+        """Inisialisasi engine OCR (dan ESRGAN) dengan crop dummy, supaya bacaan pertama tidak lambat."""
+        dummy = np.full((40, 120, 3), 255, dtype=np.uint8)
+        self.perform_ocr_detail(dummy)
+        if preload_esrgan and self.esrgan_fallback:
+            self.get_esrgan().enhance(dummy[:16, :48])
+
+    def enhance(self, img, tier='cheap'):
+        if tier == 'cheap':
+            if self.needs_upscale(img):
+                scale = self.target_height / img.shape[0]
+                img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_LANCZOS4)
+            return apply_clahe(img)
+        if tier == 'sr':
+            with self.model_lock:
+                upscaled = self.light_sr.upsample(img)
+            return apply_clahe(upscaled)
+        if tier == 'esrgan':
+            return apply_clahe(self.get_esrgan().enhance(img))
+        raise ValueError(f"Tier enhancement tidak dikenal: {tier}")
+
+    def preprocess_ocr(self, img, tier='cheap'):
+        enhanced_clahe = self.enhance(img, tier)
+        return self.binarize(enhanced_clahe), enhanced_clahe
+
+    @staticmethod
+    def binarize(enhanced):
+        gray = cv2.cvtColor(enhanced, cv2.COLOR_BGR2GRAY)
         _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        return thresh, enhanced_clahe
+        return thresh
 
     def perform_ocr(self, img):
-        preprocessed, enhanced = self.preprocess_ocr(img)
-        raw_text = pytesseract.image_to_string(preprocessed, config=self.tesseract_config)
-        return raw_text.strip(), enhanced
+        text, _, enhanced = self.perform_ocr_detail(img)
+        return text, enhanced
+
+    @metrics.timed("ocr")
+    def perform_ocr_detail(self, img):
+        # Naik ke tier yang lebih mahal hanya jika tier sebelumnya tidak menghasilkan plat valid
+        tiers = self.tiers if self.needs_upscale(img) else ['cheap']
+        text, conf, enhanced = '', 0.0, None
+        for tier in tiers:
+            with metrics.timer("ocr_enhance", tier=tier):
+                preprocessed, enhanced = self.preprocess_ocr(img, tier)
+            with metrics.timer("ocr_recognize"):
+                text, conf = self.engine.recognize(preprocessed)
+            if self.valid_plate(text):
+                break
+        return text, conf, enhanced
+
+    @metrics.timed("ocr_batch")
+    def perform_ocr_batch(self, imgs):
+        """OCR beberapa crop sekaligus, hanya crop yang gagal di tier murah yang dieskalasi."""
+        results = [None] * len(imgs)
+        pending = list(range(len(imgs)))
+        for tier in self.tiers:
+            if tier != 'cheap':
+                pending = [i for i in pending if self.needs_upscale(imgs[i])]
+            if not pending:
+                break
+
+            if tier == 'esrgan':
+                upscaled = self.get_esrgan().enhance_batch([imgs[i] for i in pending])
+                enhanced_list = [apply_clahe(img) for img in upscaled]
+            else:
+                enhanced_list = [self.enhance(imgs[i], tier) for i in pending]
+            binarized = [self.binarize(enhanced) for enhanced in enhanced_list]
+            readings = self.engine.recognize_batch(binarized)
+
+            still_pending = []
+            for i, enhanced, (text, conf) in zip(pending, enhanced_list, readings):
+                results[i] = (text, conf, enhanced)
+                if not self.valid_plate(text):
+                    still_pending.append(i)
+            pending = still_pending
+        return results
 
     def valid_plate(self, text):
         if not text:
             return False
         text = text.upper()
-        return bool(self.pattern.match(text.upper()))
\ No newline at end of file
+        return bool(self.pattern.match(text.upper()))
@@ -0,0 +1,185 @@
+import os
+import sys
+import shutil
+import threading
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WHITELIST = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+WINDOWS_TESSERACT = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+
+def find_tesseract_cmd():
+    """Cari binary tesseract: env TESSERACT_CMD, PATH, lalu lokasi default Windows."""
+    cmd = os.environ.get('TESSERACT_CMD')
+    if cmd:
+        return cmd
+    cmd = shutil.which('tesseract')
+    if cmd:
+        return cmd
+    if sys.platform.startswith('win') and os.path.isfile(WINDOWS_TESSERACT):
+        return WINDOWS_TESSERACT
+    return 'tesseract'
+
+
+def find_tessdata():
+    prefix = os.environ.get('TESSDATA_PREFIX')
+    if prefix:
+        return prefix
+    if sys.platform.startswith('win'):
+        path = os.path.join(os.path.dirname(WINDOWS_TESSERACT), 'tessdata')
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+class OcrEngine:
+    name = 'base'
+
+    def recognize(self, img):
+        """Kembalikan (teks, confidence 0..1) untuk satu crop yang sudah dipreproses."""
+        raise NotImplementedError
+
+    def recognize_batch(self, imgs):
+        return [self.recognize(img) for img in imgs]
+
+    def close(self):
+        pass
+
+
+class PytesseractEngine(OcrEngine):
+    """Engine lama: satu proses tesseract per crop."""
+    name = 'pytesseract'
+
+    def __init__(self, psm=8):
+        import pytesseract
+        self.pytesseract = pytesseract
+        pytesseract.pytesseract.tesseract_cmd = find_tesseract_cmd()
+        self.config = f'-c tessedit_char_whitelist={WHITELIST} --psm {psm} --oem 3'
+
+    def recognize(self, img):
+        data = self.pytesseract.image_to_data(img, config=self.config,
+                                              output_type=self.pytesseract.Output.DICT)
+        words, confs = [], []
+        for word, conf in zip(data["text"], data["conf"]):
+            word = word.strip()
+            if word:
+                words.append(word)
+                confs.append(max(float(conf), 0.0))
+        if not words:
+            return '', 0.0
+        return ''.join(words), sum(confs) / len(confs) / 100.0
+
+
+class TesserocrEngine(OcrEngine):
+    """Tesseract lewat C-API (tesserocr), model tetap dimuat di memori antar panggilan."""
+    name = 'tesserocr'
+
+    def __init__(self, psm=8, lang='eng'):
+        from tesserocr import PyTessBaseAPI, OEM
+        kwargs = {"lang": lang, "psm": psm, "oem": OEM.DEFAULT}
+        tessdata = find_tessdata()
+        if tessdata:
+            kwargs["path"] = tessdata
+        self.api = PyTessBaseAPI(**kwargs)
+        self.api.SetVariable('tessedit_char_whitelist', WHITELIST)
+        # PyTessBaseAPI tidak thread-safe
+        self.lock = threading.Lock()
+
+    def set_image(self, img):
+        img = np.ascontiguousarray(img)
+        h, w = img.shape[:2]
+        channels = 1 if img.ndim == 2 else img.shape[2]
+        if channels == 3:
+            img = np.ascontiguousarray(img[:, :, ::-1])  # BGR ke RGB
+        self.api.SetImageBytes(img.tobytes(), w, h, channels, w * channels)
+
+    def recognize_locked(self, img):
+        self.set_image(img)
+        text = self.api.GetUTF8Text().strip().replace(' ', '')
+        conf = max(self.api.MeanTextConf(), 0) / 100.0
+        return text, conf
+
+    def recognize(self, img):
+        with self.lock:
+            return self.recognize_locked(img)
+
+    def recognize_batch(self, imgs):
+        with self.lock:
+            return [self.recognize_locked(img) for img in imgs]
+
+    def close(self):
+        self.api.End()
+
+
+class OnnxCrnnEngine(OcrEngine):
+    """Recognizer CRNN kecil (ONNX, output CTC) yang dijalankan di dalam proses."""
+    name = 'crnn'
+
+    def __init__(self, model_path=None, input_height=32, input_width=128, charset=WHITELIST):
+        import onnxruntime as ort
+        if model_path is None:
+            model_path = os.path.join(BASE_DIR, '../model/plate_crnn.onnx')
+        if not os.path.isfile(model_path):
+            raise FileNotFoundError(f"Model CRNN tidak di temukan di path: {model_path}")
+        self.session = ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.input_height = input_height
+        self.input_width = input_width
+        self.charset = charset  # indeks 0 dipakai blank CTC
+
+    def prepare(self, img):
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        img = cv2.resize(img, (self.input_width, self.input_height), interpolation=cv2.INTER_AREA)
+        return img.astype(np.float32)[None] / 255.0
+
+    def decode(self, probs):
+        # probs: (T, C), greedy CTC decode
+        best = probs.argmax(axis=1)
+        best_prob = probs.max(axis=1)
+        chars, confs = [], []
+        prev = 0
+        for idx, p in zip(best, best_prob):
+            if idx != 0 and idx != prev:
+                chars.append(self.charset[idx - 1])
+                confs.append(float(p))
+            prev = idx
+        if not chars:
+            return '', 0.0
+        return ''.join(chars), sum(confs) / len(confs)
+
+    def recognize(self, img):
+        return self.recognize_batch([img])[0]
+
+    def recognize_batch(self, imgs):
+        if not imgs:
+            return []
+        batch = np.stack([self.prepare(img) for img in imgs])
+        logits = self.session.run(None, {self.input_name: batch})[0]  # (N, T, C)
+        logits = logits - logits.max(axis=2, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=2, keepdims=True)
+        return [self.decode(p) for p in probs]
+
+
+ENGINES = {
+    PytesseractEngine.name: PytesseractEngine,
+    TesserocrEngine.name: TesserocrEngine,
+    OnnxCrnnEngine.name: OnnxCrnnEngine,
+}
+
+
+def create_engine(name=None, **kwargs):
+    """Pilih engine OCR dari argumen atau env MPARK_OCR_ENGINE ('auto' = tesserocr, fallback pytesseract)."""
+    name = name or os.environ.get('MPARK_OCR_ENGINE', 'auto')
+    if name == 'auto':
+        try:
+            return TesserocrEngine(**kwargs)
+        except ImportError:
+            print("[WARNING] tesserocr tidak terpasang, memakai pytesseract (subprocess)")
+            return PytesseractEngine(**kwargs)
+    if name not in ENGINES:
+        raise ValueError(f"Engine OCR tidak dikenal: {name} (pilihan: auto, {', '.join(ENGINES)})")
+    return ENGINES[name](**kwargs)
@@ -1,25 +1,356 @@
-import threading
+import time
 import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.metrics import REGISTRY, SIZE_BUCKETS
 from src.ocr import PlateOCR
+from src.voting import PlateVoter
+
+
+class OcrRequest:
+    def __init__(self, lane, is_entry, crop, track_id=None, final=True, fingerprint=None):
+        self.lane = lane
+        self.is_entry = is_entry
+        self.crop = crop
+        self.track_id = track_id
+        self.final = final
+        self.fingerprint = fingerprint
+        self.enqueued_at = time.perf_counter()
+
+
+class OcrMetrics:
+    def __init__(self, window=200):
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.processed = 0
+        self.dropped_full = 0
+        self.dropped_stale = 0
+        self.coalesced = 0
+        self.cached = 0
+        self.latency = {
+            "wait": deque(maxlen=window),
+            "ocr": deque(maxlen=window),
+            "total": deque(maxlen=window),
+        }
+
+    def count(self, name, n=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.latency[stage].append(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            latency = {}
+            for stage, samples in self.latency.items():
+                ordered = sorted(samples)
+                latency[stage] = {
+                    "avg_ms": (sum(ordered) / len(ordered) * 1000.0) if ordered else 0.0,
+                    "p95_ms": (ordered[int(0.95 * (len(ordered) - 1))] * 1000.0) if ordered else 0.0,
+                }
+            return {
+                "submitted": self.submitted,
+                "processed": self.processed,
+                "dropped_full": self.dropped_full,
+                "dropped_stale": self.dropped_stale,
+                "coalesced": self.coalesced,
+                "cached": self.cached,
+                "latency": latency,
+            }
+
+
+class OcrQueue:
+    """Antrian bounded per lane. Lane keluar selalu dilayani lebih dulu dari lane masuk."""
+
+    def __init__(self, maxsize_per_lane=3, max_age=5.0, metrics=None, on_drop_final=None):
+        self.maxsize_per_lane = maxsize_per_lane
+        self.max_age = max_age
+        self.metrics = metrics or OcrMetrics()
+        # Dipanggil (request) kalau crop final terpaksa dibuang, supaya voting track tetap ditutup
+        self.on_drop_final = on_drop_final
+        self.cond = threading.Condition()
+        self.lanes = {}  # nama lane -> deque
+        self.priority = []  # urutan pelayanan: lane keluar dulu, baru lane masuk
+        self.in_flight = {}  # (lane, track_id) -> jumlah request yang sedang di-OCR
+
+    def put(self, request):
+        if not isinstance(request, OcrRequest):
+            request = OcrRequest(*request)
+        with self.cond:
+            lane = self.lanes.get(request.lane)
+            if lane is None:
+                lane = self.lanes[request.lane] = deque()
+                self.priority.append((request.is_entry, request.lane))
+                self.priority.sort(key=lambda item: item[0])
+            self.metrics.count("submitted")
+            REGISTRY.inc("ocr_submitted_total", lane=request.lane)
+
+            # Crop baru dari kendaraan yang sama menggantikan crop lama yang belum diproses.
+            # Crop final tidak pernah menggantikan / digantikan: end_track mengirim beberapa crop
+            # berurutan dan semuanya harus sampai ke voter sebagai bacaan terpisah.
+            if request.track_id is not None and not request.final:
+                for i, pending in enumerate(lane):
+                    if pending.track_id == request.track_id and not pending.final:
+                        request.enqueued_at = pending.enqueued_at
+                        lane[i] = request
+                        self.metrics.count("coalesced")
+                        REGISTRY.inc("ocr_coalesced_total", lane=request.lane)
+                        return
+
+            if len(lane) >= self.maxsize_per_lane:
+                # Yang dibuang crop non-final paling lama; crop final hanya dibuang kalau isinya final semua
+                victim = next((pending for pending in lane if not pending.final), None)
+                if victim is None and not request.final:
+                    victim = request
+                elif victim is None:
+                    victim = next((pending for pending in lane
+                                   if not self.in_flight.get((pending.lane, pending.track_id))), lane[0])
+                self.drop(victim, "full")
+                if victim is request:
+                    return
+            lane.append(request)
+            REGISTRY.set_gauge("ocr_queue_depth", len(lane), lane=request.lane)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while True:
+                request = self.pop_fresh()
+                if request is not None:
+                    return request
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self.cond.wait(remaining)
+
+    def get_batch(self, max_items, timeout=None):
+        """Tunggu satu request, lalu ambil request lain yang sudah antri (tanpa menunggu) sampai max_items."""
+        requests = [self.get(timeout)]
+        with self.cond:
+            while len(requests) < max_items:
+                request = self.pop_fresh()
+                if request is None:
+                    break
+                requests.append(request)
+        return requests
+
+    def pop_fresh(self):
+        now = time.perf_counter()
+        for _, name in self.priority:
+            lane = self.lanes[name]
+            for request in list(lane):
+                # Crop final menutup voting track, jadi baru diproses (atau dibuang) setelah crop lain
+                # dari track yang sama selesai di worker lain
+                if request.final and self.in_flight.get((name, request.track_id)):
+                    continue
+                if now - request.enqueued_at > self.max_age:
+                    self.drop(request, "stale")
+                    continue
+                lane.remove(request)
+                if request.track_id is not None:
+                    key = (name, request.track_id)
+                    self.in_flight[key] = self.in_flight.get(key, 0) + 1
+                REGISTRY.set_gauge("ocr_queue_depth", len(lane), lane=name)
+                return request
+            REGISTRY.set_gauge("ocr_queue_depth", len(lane), lane=name)
+        return None
+
+    def drop(self, request, reason):
+        lane = self.lanes[request.lane]
+        if request in lane:
+            lane.remove(request)
+        self.metrics.count("dropped_" + reason)
+        REGISTRY.inc("ocr_dropped_total", lane=request.lane, reason=reason)
+        if request.final and self.on_drop_final is not None:
+            self.on_drop_final(request)
+
+    def done(self, request):
+        """Dipanggil worker setelah hasil request dikirim ke voter."""
+        if request.track_id is None:
+            return
+        with self.cond:
+            key = (request.lane, request.track_id)
+            count = self.in_flight.get(key, 0) - 1
+            if count > 0:
+                self.in_flight[key] = count
+            else:
+                self.in_flight.pop(key, None)
+            self.cond.notify_all()
+
+    def depth(self):
+        with self.cond:
+            return {name: len(lane) for name, lane in self.lanes.items()}
+
+
+# Dipakai oleh ProcessPoolExecutor, satu PlateOCR per proses
+_process_ocr = None
+
+
+def init_process_worker(ocr_kwargs):
+    global _process_ocr
+    _process_ocr = PlateOCR(**ocr_kwargs)
+
+
+def process_ocr_job(crop_imgs):
+    return run_ocr_batch(_process_ocr, crop_imgs)
+
+
+def run_ocr(ocr, crop_img):
+    plate_text, conf, enhanced_plate = ocr.perform_ocr_detail(crop_img)
+    if not ocr.valid_plate(plate_text):
+        plate_text = None
+    return plate_text, conf, enhanced_plate
+
+
+def run_ocr_batch(ocr, crop_imgs):
+    """OCR beberapa crop sekaligus: tier enhancement (termasuk ESRGAN) jalan per batch, bukan per crop."""
+    if len(crop_imgs) == 1:
+        return [run_ocr(ocr, crop_imgs[0])]
+    readings = []
+    for plate_text, conf, enhanced_plate in ocr.perform_ocr_batch(crop_imgs):
+        if not ocr.valid_plate(plate_text):
+            plate_text = None
+        readings.append((plate_text, conf, enhanced_plate))
+    return readings
+
+
+def deliver(result_queue, voter, lane, track_id, final, plate_text, conf, enhanced_plate):
+    low_confidence = False
+    if voter is not None:
+        # Plat hanya diteruskan kalau bacaan-bacaan satu track sudah sepakat
+        track_key = None if track_id is None else (lane, track_id)
+        plate_text, low_confidence = voter.add(track_key, plate_text, conf, final)
+    result_queue.put((lane, plate_text, enhanced_plate, low_confidence))
+
 
 class OcrWorker(threading.Thread):
-    def __init__(self, ocr_queue: queue.Queue, result_queue: queue.Queue):
+    """Ambil beberapa request sekaligus (maks batch_size) dan OCR dalam satu panggilan perform_ocr_batch."""
+
+    def __init__(self, ocr_queue, result_queue: queue.Queue, ocr=None, executor=None, metrics=None, voter=None,
+                 on_reading=None, batch_size=4):
         super().__init__(daemon=True)
         self.ocr_queue = ocr_queue
         self.result_queue = result_queue
-        self.ocr = PlateOCR()
+        self.executor = executor
+        self.voter = voter
+        self.batch_size = max(1, batch_size)
+        # Dipanggil (request, teks, conf, enhanced) untuk setiap bacaan mentah, mis. untuk cache crop
+        self.on_reading = on_reading
+        self.ocr = ocr if ocr is not None or executor is not None else PlateOCR()
+        self.metrics = metrics or getattr(ocr_queue, 'metrics', None) or OcrMetrics()
         self.running = True
 
     def run(self):
         while self.running:
             try:
-                is_entry, crop_img = self.ocr_queue.get(timeout=1)
-                plate_text, enhanced_plate = self.ocr.perform_ocr(crop_img)
-                valid = self.ocr.valid_plate(plate_text)
-                if not valid:
-                    plate_text = None
-                self.result_queue.put((is_entry, plate_text, enhanced_plate))
+                requests = self.ocr_queue.get_batch(self.batch_size, timeout=1)
             except queue.Empty:
                 continue
 
+            try:
+                self.process(requests)
+            finally:
+                for request in requests:
+                    self.ocr_queue.done(request)
+
+    def process(self, requests):
+        start = time.perf_counter()
+        crops = [request.crop for request in requests]
+        try:
+            if self.executor is not None:
+                readings = self.executor.submit(process_ocr_job, crops).result()
+            else:
+                readings = run_ocr_batch(self.ocr, crops)
+        except Exception as e:
+            print(f"[ERROR] Gagal OCR: {e}")
+            for request in requests:
+                if request.final:
+                    # Voting track tetap ditutup dengan bacaan yang sudah ada
+                    deliver(self.result_queue, self.voter, request.lane, request.track_id, True, None, 0.0, None)
+            return
+        end = time.perf_counter()
+        REGISTRY.record("ocr_job", start, end, args={"batch": len(requests)})
+        REGISTRY.observe("ocr_batch_size", len(requests), SIZE_BUCKETS)
+
+        # Urutan request dipertahankan: crop non-final sebuah track sampai ke voter sebelum crop final
+        for request, (plate_text, conf, enhanced_plate) in zip(requests, readings):
+            # Waktu tunggu di antrian ikut masuk trace supaya antrian yang menumpuk terlihat
+            REGISTRY.record("ocr_queue_wait", request.enqueued_at, start, lane=request.lane)
+            if self.on_reading is not None:
+                self.on_reading(request, plate_text, conf, enhanced_plate)
+            deliver(self.result_queue, self.voter, request.lane, request.track_id, request.final,
+                    plate_text, conf, enhanced_plate)
+
+            self.metrics.count("processed")
+            self.metrics.observe("wait", start - request.enqueued_at)
+            self.metrics.observe("ocr", end - start)
+            self.metrics.observe("total", end - request.enqueued_at)
+
+
+class OcrPool:
+    """Beberapa OcrWorker yang berbagi satu antrian prioritas dan satu model enhancement."""
+
+    def __init__(self, result_queue, num_workers=2, use_processes=False, maxsize_per_lane=3, max_age=5.0,
+                 ocr_kwargs=None, voter=None, on_reading=None, batch_size=4):
+        ocr_kwargs = ocr_kwargs or {}
+        self.result_queue = result_queue
+        self.metrics = OcrMetrics()
+        self.voter = voter or PlateVoter()
+        self.queue = OcrQueue(maxsize_per_lane=maxsize_per_lane, max_age=max_age, metrics=self.metrics,
+                              on_drop_final=self.close_track)
+
+        self.executor = None
+        self.ocr = None
+        if use_processes:
+            # Tesseract/NumPy berjalan di proses terpisah, lepas dari GIL
+            self.executor = ProcessPoolExecutor(max_workers=num_workers, initializer=init_process_worker,
+                                                initargs=(ocr_kwargs,))
+        else:
+            self.ocr = PlateOCR(**ocr_kwargs)
+
+        self.workers = [OcrWorker(self.queue, result_queue, ocr=self.ocr, executor=self.executor,
+                                  metrics=self.metrics, voter=self.voter, on_reading=on_reading,
+                                  batch_size=batch_size)
+                        for _ in range(num_workers)]
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def warmup(self, preload_esrgan=False):
+        if self.executor is not None:
+            # Satu job dummy per proses supaya engine di setiap proses sudah siap
+            dummy = np.full((40, 120, 3), 255, dtype=np.uint8)
+            for future in [self.executor.submit(process_ocr_job, [dummy]) for _ in self.workers]:
+                future.result()
+        else:
+            self.ocr.warmup(preload_esrgan)
+
+    def submit(self, lane, is_entry, crop, track_id=None, final=True, fingerprint=None):
+        self.queue.put(OcrRequest(lane, is_entry, crop, track_id, final, fingerprint))
+
+    def submit_reading(self, lane, plate_text, conf, enhanced_plate, track_id=None, final=True):
+        """Bacaan yang sudah ada (mis. dari cache crop) langsung ikut voting tanpa antri OCR."""
+        self.metrics.count("cached")
+        REGISTRY.inc("ocr_cached_total", lane=lane)
+        deliver(self.result_queue, self.voter, lane, track_id, final, plate_text, conf, enhanced_plate)
+
+    def close_track(self, request):
+        """Crop final yang dibuang antrian tetap menutup voting track dengan bacaan yang sudah ada."""
+        deliver(self.result_queue, self.voter, request.lane, request.track_id, True, None, 0.0, None)
+
+    def stats(self):
+        stats = self.metrics.snapshot()
+        stats["queue_depth"] = self.queue.depth()
+        return stats
 
+    def stop(self):
+        for worker in self.workers:
+            worker.running = False
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
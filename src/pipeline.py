@@ -0,0 +1,253 @@
+import time
+import threading
+import cv2
+import numpy as np
+from src import metrics
+from src.tracker import PlateTracker
+from src.motion import MotionGate
+
+
+class LaneState:
+    def __init__(self, stream_type, roi_getter, is_entry=True, motion=None):
+        self.stream_type = stream_type
+        self.roi_getter = roi_getter
+        self.is_entry = is_entry
+        # None: deteksi setiap frame tanpa filter gerakan
+        self.motion = motion
+
+        # Slot frame terbaru dari kamera (frame lama ditimpa, bukan diantrikan)
+        self.frame = None
+        self.frame_time = 0.0
+        self.frame_seq = 0
+        self.pending = 0
+
+        # Hasil terakhir yang dipublish ke UI
+        self.result = None
+        self.seq = 0
+        # Ring buffer frame tampilan, UI masih bisa membaca frame lama saat frame baru ditulis
+        self.display_buffers = []
+        self.display_index = 0
+
+        self.tracker = PlateTracker()
+
+        self.queue_depth = 0
+        self.latency = 0.0
+        self.process_time = 0.0
+        self.frames_in = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.first_detection_at = None
+
+
+class DetectionPipeline(threading.Thread):
+    def __init__(self, detector, frame_width, frame_height, on_ocr_candidate=None, motion_gate=True,
+                 motion_kwargs=None, started_at=None):
+        super().__init__(daemon=True)
+        # detector boleh None saat model masih dimuat: frame tetap ditampilkan, lane berstatus warming
+        self.detector = detector
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.on_ocr_candidate = on_ocr_candidate
+        self.motion_gate = motion_gate
+        self.motion_kwargs = motion_kwargs or {}
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.lanes = {}
+        self.cond = threading.Condition()
+        self.running = True
+
+    def add_lane(self, stream_type, roi_getter, is_entry=True):
+        with self.cond:
+            motion = MotionGate(**self.motion_kwargs) if self.motion_gate else None
+            self.lanes[stream_type] = LaneState(stream_type, roi_getter, is_entry, motion)
+
+    def submit(self, stream_type, frame, seq=None, captured_at=None):
+        """Dipanggil dari thread kamera, hanya menyimpan frame terbaru per lane."""
+        with self.cond:
+            lane = self.lanes[stream_type]
+            if lane.frame is not None:
+                lane.frames_dropped += 1
+            lane.frame = frame
+            lane.frame_time = captured_at if captured_at is not None else time.perf_counter()
+            lane.frame_seq = seq if seq is not None else lane.frame_seq + 1
+            lane.pending += 1
+            lane.frames_in += 1
+            self.cond.notify()
+
+    def set_detector(self, detector):
+        with self.cond:
+            self.detector = detector
+
+    @property
+    def ready(self):
+        return self.detector is not None
+
+    def wants_frame(self, stream_type):
+        """True kalau slot lane kosong, kamera cukup decode frame saat ini yang benar-benar akan diproses."""
+        with self.cond:
+            lane = self.lanes.get(stream_type)
+            return lane is not None and lane.frame is None
+
+    def get_result(self, stream_type):
+        with self.cond:
+            lane = self.lanes.get(stream_type)
+            if lane is None:
+                return None
+            return lane.result
+
+    def stats(self, stream_type):
+        with self.cond:
+            lane = self.lanes.get(stream_type)
+            if lane is None:
+                return {}
+            return {
+                "latency_ms": lane.latency * 1000.0,
+                "process_ms": lane.process_time * 1000.0,
+                "queue_depth": lane.queue_depth,
+                "frames_in": lane.frames_in,
+                "frames_processed": lane.frames_processed,
+                "frames_dropped": lane.frames_dropped,
+                "motion": lane.motion.stats() if lane.motion else None,
+                "state": 'ready' if self.detector is not None else 'warming',
+                "first_detection_s": (lane.first_detection_at - self.started_at
+                                      if lane.first_detection_at is not None else None),
+            }
+
+    def take_jobs(self):
+        with self.cond:
+            while self.running and not any(lane.frame is not None for lane in self.lanes.values()):
+                self.cond.wait(timeout=0.5)
+
+            jobs = []
+            for lane in self.lanes.values():
+                if lane.frame is None:
+                    continue
+                jobs.append((lane, lane.frame, (lane.frame_seq, lane.frame_time)))
+                lane.queue_depth = lane.pending
+                lane.frame = None
+                lane.pending = 0
+            return jobs
+
+    def run(self):
+        while self.running:
+            jobs = self.take_jobs()
+            if not jobs:
+                continue
+            try:
+                self.process_batch(jobs)
+            except Exception as e:
+                print(f"[ERROR] Gagal deteksi batch: {e}")
+
+    def process_batch(self, jobs):
+        """Semua lane yang punya frame baru dideteksi dalam satu panggilan model per tick.
+
+        Frame native dari kamera tidak di-resize: ROI (koordinat tampilan) dipetakan ke resolusi native,
+        hanya ROI yang di-letterbox untuk YOLO dan crop plat diambil dari frame native.
+        Frame tampilan ditulis ke buffer yang dipakai ulang, koordinat bbox dikembalikan ke ukuran tampilan.
+        """
+        start = time.perf_counter()
+
+        frames = [frame for _, frame, _ in jobs]
+        scales = [self.native_scale(frame) for frame in frames]
+        rois = [lane.roi_getter() for lane, _, _ in jobs]
+        native_rois = [self.map_box(roi, sx, sy) if roi else None for roi, (sx, sy) in zip(rois, scales)]
+
+        # Lane tanpa gerakan di ROI tidak ikut batch YOLO
+        gate_time = time.monotonic()
+        detector = self.detector
+        active = []
+        if detector is not None:
+            with metrics.timer("motion_gate"):
+                active = [i for i, ((lane, _, _), frame, roi) in enumerate(zip(jobs, frames, native_rois))
+                          if lane.motion is None or lane.motion.update(frame, roi, gate_time)]
+        all_plates = [[] for _ in jobs]
+        if active:
+            detected = detector.detect_batch([frames[i] for i in active], [native_rois[i] for i in active])
+            for i, plates in zip(active, detected):
+                all_plates[i] = plates
+
+        now = time.time()
+        displays = []
+        for (lane, _, _), frame, roi, (sx, sy), plates in zip(jobs, frames, rois, scales, all_plates):
+            if plates and lane.first_detection_at is None:
+                lane.first_detection_at = time.perf_counter()
+                print(f"[INFO] Deteksi pertama lane {lane.stream_type}: "
+                      f"{lane.first_detection_at - self.started_at:.1f} s sejak start")
+            for det in plates:
+                # Crop resolusi native untuk OCR; disalin supaya tracker tidak menahan seluruh frame
+                det["cropped_plate"] = det["cropped_plate"].copy()
+                det["native_bbox"] = det["bbox"]
+                det["bbox"] = self.map_box(det["bbox"], 1.0 / sx, 1.0 / sy)
+
+            # Tracker yang memutuskan crop mana yang layak di-OCR; lane idle tetap di-update
+            # supaya track yang berakhir mengirim crop final
+            for candidate in lane.tracker.update(plates, now):
+                if self.on_ocr_candidate:
+                    self.on_ocr_candidate(lane.stream_type, candidate)
+            if lane.motion is not None and lane.tracker.tracks:
+                lane.motion.keep_alive(gate_time)
+
+            display = self.display_frame(lane, frame)
+            self.annotate(display, roi, plates, lane.is_entry)
+            displays.append(display)
+
+        end = time.perf_counter()
+        metrics.record("pipeline_batch", start, end, args={"lanes": len(jobs), "active": len(active)})
+        metrics.observe("pipeline_batch_lanes", len(jobs), metrics.SIZE_BUCKETS)
+        for lane, _, (_, frame_time) in jobs:
+            # Capture -> hasil deteksi siap ditampilkan
+            metrics.observe("frame_latency_seconds", end - frame_time, lane=lane.stream_type)
+        with self.cond:
+            for (lane, _, (frame_seq, frame_time)), display, plates in zip(jobs, displays, all_plates):
+                lane.seq += 1
+                lane.result = {
+                    "seq": lane.seq,
+                    "frame_seq": frame_seq,
+                    "frame": display,
+                    "detections": plates,
+                    "frame_time": frame_time,
+                }
+                lane.process_time = end - start
+                lane.latency = end - frame_time
+                lane.frames_processed += 1
+
+    def native_scale(self, frame):
+        return frame.shape[1] / self.frame_width, frame.shape[0] / self.frame_height
+
+    @staticmethod
+    def map_box(box, sx, sy):
+        x1, y1, x2, y2 = box
+        return int(x1 * sx), int(y1 * sy), int(x2 * sx), int(y2 * sy)
+
+    def display_frame(self, lane, frame, ring_size=3):
+        if not lane.display_buffers:
+            lane.display_buffers = [np.empty((self.frame_height, self.frame_width, 3), dtype=np.uint8)
+                                    for _ in range(ring_size)]
+        lane.display_index = (lane.display_index + 1) % len(lane.display_buffers)
+        buffer = lane.display_buffers[lane.display_index]
+        if frame.shape[:2] == buffer.shape[:2]:
+            np.copyto(buffer, frame)
+        else:
+            cv2.resize(frame, (self.frame_width, self.frame_height), dst=buffer, interpolation=cv2.INTER_AREA)
+        return buffer
+
+    def annotate(self, frame, roi, plates, is_entry):
+        if roi:
+            self.draw_roi(frame, roi, stream_type='in' if is_entry else 'out')
+
+        color = (0, 255, 0) if is_entry else (0, 0, 255)
+        for det in plates:
+            x1, y1, x2, y2 = det["bbox"]
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, f"#{det.get('track_id', '-')} {det['confidence']:.2f}", (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+
+    @staticmethod
+    def draw_roi(frame, roi, stream_type='in', thickness=2):
+        x1, y1, x2, y2 = roi
+        color = (255, 0, 0) if stream_type == 'in' else (0, 0, 255)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
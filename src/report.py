@@ -0,0 +1,201 @@
+import sys
+import csv
+import argparse
+import contextlib
+from datetime import datetime, timedelta
+from src.storage import SqliteStore, MongoStore, LOCAL_DB_PATH
+from src.table_model import MAX_DURATION
+from src.history import parse_date
+
+SESSION_FIELDS = ['plat_nomor', 'waktu_masuk', 'waktu_keluar', 'durasi_menit', 'status', 'terlambat']
+SUMMARY_FIELDS = ['periode', 'masuk', 'selesai', 'aktif', 'terlambat', 'rata_durasi_menit', 'p95_durasi_menit']
+
+
+def open_store(source='auto', mongo_uri="mongodb://localhost:27017/", local_path=LOCAL_DB_PATH):
+    """Store untuk dibaca, aturannya sama dengan ParkingDatabase: Mongo kalau bisa dihubungi, selain itu lokal."""
+    if source in ('auto', 'mongo') and mongo_uri:
+        try:
+            remote = MongoStore(mongo_uri)
+        except ImportError as e:
+            if source == 'mongo':
+                raise
+            print(f"[WARNING] {e}, memakai database lokal {local_path}")
+            return SqliteStore(local_path)
+        if remote.ping():
+            return remote
+        if source == 'mongo':
+            raise ConnectionError(f"Mongo {mongo_uri} tidak bisa dihubungi")
+        print(f"[WARNING] Mongo {mongo_uri} tidak bisa dihubungi, memakai database lokal {local_path}")
+    return SqliteStore(local_path)
+
+
+def session_rows(store, start=None, end=None, now=None, batch_size=1000):
+    """Satu baris per sesi parkir, aturan terlambat sama dengan tabel monitoring (lebih dari 3 jam)."""
+    now = now or datetime.now()
+    for entry in store.iter_sessions(start, end, batch_size):
+        waktu_masuk = entry.get('waktu_masuk')
+        waktu_keluar = entry.get('waktu_keluar')
+        selesai = isinstance(waktu_keluar, datetime)
+        durasi = (waktu_keluar if selesai else now) - waktu_masuk
+        yield {
+            "plat_nomor": entry.get('plat_nomor'),
+            "waktu_masuk": waktu_masuk,
+            "waktu_keluar": waktu_keluar if selesai else None,
+            "durasi_menit": round(durasi.total_seconds() / 60.0, 2),
+            "status": 'selesai' if selesai else 'aktif',
+            "terlambat": durasi > MAX_DURATION,
+        }
+
+
+def summary_rows(store, unit='day', start=None, end=None, now=None, batch_size=1000):
+    """Ringkasan per periode. Jumlah dan rata-rata dari aggregation store, p95 diambil dengan
+    menyusuri durasi terurut per periode, jadi memori tidak bergantung pada jumlah sesi."""
+    summaries = store.summarize_sessions(unit, start, end, now or datetime.now(),
+                                         MAX_DURATION.total_seconds(), batch_size)
+    durations = store.iter_durations(unit, start, end, batch_size)
+    pending = next(durations, None)
+
+    for summary in summaries:
+        bucket = summary["bucket"]
+        selesai = summary["selesai"]
+        target = int(0.95 * (selesai - 1)) if selesai else -1
+        p95 = None
+        index = 0
+        # Kedua stream urut periode, durasi periode ini dikonsumsi sampai periode berikutnya
+        while pending is not None and pending[0] <= bucket:
+            if pending[0] == bucket:
+                if index == target:
+                    p95 = pending[1]
+                index += 1
+            pending = next(durations, None)
+
+        yield {
+            "periode": bucket,
+            "masuk": summary["masuk"],
+            "selesai": selesai,
+            "aktif": summary["masuk"] - selesai,
+            "terlambat": summary["terlambat"],
+            "rata_durasi_menit": round(summary["durasi_total"] / selesai / 60.0, 2) if selesai else None,
+            "p95_durasi_menit": round(p95 / 60.0, 2) if p95 is not None else None,
+        }
+
+
+class CsvExporter:
+    def __init__(self, path, fields):
+        self.file = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=fields)
+        self.writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            self.writer.writerow({key: format_value(value) for key, value in row.items()})
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class ParquetExporter:
+    """Setiap batch ditulis sebagai row group, file tidak pernah dibangun utuh di memori."""
+
+    def __init__(self, path, fields):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Export Parquet butuh pyarrow: pip install pyarrow") from e
+        types = {
+            "plat_nomor": pa.string(), "waktu_masuk": pa.timestamp('us'), "waktu_keluar": pa.timestamp('us'),
+            "durasi_menit": pa.float64(), "status": pa.string(), "terlambat": pa.bool_(),
+            "periode": pa.string(), "masuk": pa.int64(), "selesai": pa.int64(), "aktif": pa.int64(),
+            "rata_durasi_menit": pa.float64(), "p95_durasi_menit": pa.float64(),
+        }
+        # Kolom terlambat di ringkasan berisi jumlah, bukan flag
+        if "periode" in fields:
+            types["terlambat"] = pa.int64()
+        self.pa = pa
+        self.schema = pa.schema([(field, types[field]) for field in fields])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+EXPORTERS = {"csv": CsvExporter, "parquet": ParquetExporter}
+
+
+def format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ', timespec='seconds')
+    return '' if value is None else value
+
+
+def export(rows, exporter, batch_size=1000):
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            exporter.write(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        exporter.write(batch)
+        count += len(batch)
+    return count
+
+
+def parse_day(text):
+    try:
+        return parse_date(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Format tanggal harus dd/mm/yyyy")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Laporan dan export riwayat parkir (dibaca per batch)")
+    parser.add_argument('report', choices=['sessions', 'summary'],
+                        help="sessions: satu baris per sesi, summary: ringkasan per hari / jam")
+    parser.add_argument('--by', default='day', choices=['day', 'hour'], help="Periode ringkasan")
+    parser.add_argument('--start', type=parse_day, help="Tanggal masuk awal dd/mm/yyyy")
+    parser.add_argument('--end', type=parse_day, help="Tanggal masuk akhir dd/mm/yyyy (ikut dihitung)")
+    parser.add_argument('--output', default='-', help="File output, '-' untuk stdout (CSV)")
+    parser.add_argument('--format', choices=list(EXPORTERS), help="Default dari ekstensi output, selain itu csv")
+    parser.add_argument('--source', default='auto', choices=['auto', 'mongo', 'local'])
+    parser.add_argument('--mongo-uri', default="mongodb://localhost:27017/")
+    parser.add_argument('--local-path', default=LOCAL_DB_PATH)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    fmt = args.format or ('parquet' if args.output.lower().endswith('.parquet') else 'csv')
+    if fmt == 'parquet' and args.output == '-':
+        parser.error("Parquet harus ditulis ke file, pakai --output")
+    end = args.end + timedelta(days=1) if args.end else None
+    fields = SESSION_FIELDS if args.report == 'sessions' else SUMMARY_FIELDS
+
+    # Log ke stderr supaya stdout hanya berisi data
+    with contextlib.redirect_stdout(sys.stderr):
+        store = open_store(args.source, args.mongo_uri if args.source != 'local' else None, args.local_path)
+        now = datetime.now()
+        if args.report == 'sessions':
+            rows = session_rows(store, args.start, end, now, args.batch_size)
+        else:
+            rows = summary_rows(store, args.by, args.start, end, now, args.batch_size)
+
+    try:
+        exporter = EXPORTERS[fmt](args.output, fields)
+    except ImportError as e:
+        parser.error(str(e))
+    try:
+        count = export(rows, exporter, args.batch_size)
+    finally:
+        exporter.close()
+    print(f"[INFO] {count} baris {args.report} ditulis ke {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
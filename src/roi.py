@@ -1,13 +1,16 @@
 class ROIManager:
 
-    def __init__(self, canvas_in, canvas_out, frame_width, frame_height):
+    def __init__(self, canvas_in, canvas_out, frame_width, frame_height,
+                 roi_masuk=(200, 200, 580, 300), roi_keluar=(200, 200, 580, 300), on_change=None):
         self.canvas_in = canvas_in
         self.canvas_out = canvas_out
         self.frame_width = frame_width
         self.frame_height = frame_height
 
-        self.roi_masuk = (200, 200, 580, 300)
-        self.roi_keluar = (200, 200, 580, 300)
+        self.roi_masuk = tuple(roi_masuk)
+        self.roi_keluar = tuple(roi_keluar)
+        # Dipanggil (stream_type, roi) setiap ROI digeser, mis. untuk meneruskan ke GateService
+        self.on_change = on_change
 
         self.roi_handle_size = 8
 
@@ -36,6 +39,8 @@ class ROIManager:
             self.roi_masuk = roi
         else:
             self.roi_keluar = roi
+        if self.on_change:
+            self.on_change(stream_type, roi)
 
     def on_mouse_down(self, event, stream_type):
         roi, canvas = self.get_roi_and_canvas(stream_type)
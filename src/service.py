@@ -0,0 +1,362 @@
+import json
+import time
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+from src import metrics
+from src.db import ParkingDatabase
+from src.deteksi import PlateDetector
+from src.cache import PlateCache, CropCache
+from src.utils import dhash
+from src.ocr_worker import OcrPool
+from src.camera import Camera, open_capture
+from src.pipeline import DetectionPipeline
+
+DEFAULT_ROI = (200, 200, 580, 300)
+
+# Dipakai kalau config tidak menyebut lane, sama dengan dua lane aplikasi lama
+DEFAULT_LANES = [
+    {"name": "in", "direction": "masuk"},
+    {"name": "out", "direction": "keluar"},
+]
+
+
+def load_config(path):
+    """Baca config gate dari file YAML atau JSON."""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+
+class Lane:
+    def __init__(self, name, direction='masuk', source=None, roi=None, capture_backend=None):
+        if direction not in ('masuk', 'keluar'):
+            raise ValueError(f"Arah lane {name} harus 'masuk' atau 'keluar', bukan {direction!r}")
+        self.name = name
+        self.direction = direction
+        self.is_entry = direction == 'masuk'
+        self.source = source
+        self.roi = tuple(roi) if roi else DEFAULT_ROI
+        self.capture_backend = capture_backend
+
+        self.camera = None
+        self.error = None
+        self.plate_cache = PlateCache()
+        self.crop_cache = CropCache()
+        self.last_plate = None
+        self.last_plate_time = None
+        self.last_enhanced = None
+        self.ocr_skipped = False
+        self.pending_preview = None
+
+
+class GateService:
+    """Layanan gate tanpa UI: capture -> deteksi -> OCR -> database untuk N lane.
+
+    Setiap lane punya thread kamera sendiri, deteksi semua lane di-batch oleh DetectionPipeline,
+    hasil OCR dikonsumsi thread service. Event plat dikirim ke subscriber (UI Tk, API HTTP).
+
+    Model dimuat di background setelah start(): kamera dan UI langsung jalan, lane berstatus warming
+    sampai detector selesai dimuat dan di-warm-up.
+    """
+
+    def __init__(self, config=None, started_at=None):
+        config = config or {}
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.frame_width = config.get("frame_width", 640)
+        self.frame_height = config.get("frame_height", 360)
+        # None: dipilih otomatis oleh PlateDetector (cuda kalau tersedia) saat model dimuat
+        self.device = config.get("device")
+        # backend: auto | gstreamer | ffmpeg | opencv, decode_scaled: decode langsung ke ukuran frame deteksi
+        self.capture_config = config.get("capture", {})
+        self.detector_config = config.get("detector", {})
+        self.preload_esrgan = config.get("warmup", {}).get("preload_esrgan", True)
+        # trace_seconds: jendela trace di memori, trace_dump: file Chrome trace yang ditulis saat stop
+        metrics_config = dict(config.get("metrics", {}))
+        self.trace_dump = metrics_config.pop("trace_dump", None)
+        metrics.REGISTRY.configure(**metrics_config)
+
+        self.detector = None
+        self.ready = threading.Event()
+        self.startup = {}  # metrik cold start dalam detik
+        # Event ditulis ke SQLite lokal, replikasi ke Mongo berjalan di thread sendiri
+        self.db = ParkingDatabase(**config.get("database", {}))
+
+        self.ocr_result_queue = queue.Queue()
+        self.ocr_pool = OcrPool(self.ocr_result_queue, on_reading=self.remember_reading, **config.get("ocr", {}))
+        # Filter gerakan per lane sebelum YOLO, `motion: {enabled: false}` untuk mematikan
+        motion_config = dict(config.get("motion", {}))
+        self.pipeline = DetectionPipeline(None, self.frame_width, self.frame_height,
+                                          on_ocr_candidate=self.handle_plate_detection,
+                                          motion_gate=motion_config.pop("enabled", True),
+                                          motion_kwargs=motion_config, started_at=self.started_at)
+
+        self.lanes = {}
+        for lane_config in config.get("lanes") or DEFAULT_LANES:
+            self.add_lane(**lane_config)
+
+        self.lock = threading.Lock()
+        self.events = deque(maxlen=config.get("event_history", 100))
+        self.event_seq = 0
+        self.subscribers = []
+
+        self.running = False
+        self.stopped = False
+        self.consumer = threading.Thread(target=self.consume_results, daemon=True)
+
+    def add_lane(self, name, direction='masuk', source=None, roi=None, capture_backend=None):
+        if name in self.lanes:
+            raise ValueError(f"Lane {name} sudah ada")
+        lane = Lane(name, direction, source, roi, capture_backend)
+        self.lanes[name] = lane
+        self.pipeline.add_lane(name, lambda: lane.roi, is_entry=lane.is_entry)
+        return lane
+
+    def lane_for(self, is_entry):
+        """Lane pertama dengan arah tertentu, dipakai UI yang hanya punya satu kanvas per arah."""
+        for lane in self.lanes.values():
+            if lane.is_entry == is_entry:
+                return lane
+        return None
+
+    def start(self):
+        self.running = True
+        self.pipeline.start()
+        self.ocr_pool.start()
+        self.consumer.start()
+        threading.Thread(target=self.load_models, daemon=True).start()
+        for lane in self.lanes.values():
+            if lane.source is not None:
+                self.set_source(lane.name, lane.source)
+
+    def load_models(self):
+        """Detector dan model OCR dimuat paralel, masing-masing di-warm-up dengan input dummy."""
+        start = time.perf_counter()
+        ocr_thread = threading.Thread(target=self.warm_up_ocr, daemon=True)
+        ocr_thread.start()
+
+        try:
+            detector = PlateDetector(device=self.device, **self.detector_config)
+            self.startup["detector_load_s"] = time.perf_counter() - start
+            warm_start = time.perf_counter()
+            detector.warmup((self.frame_height, self.frame_width, 3), batch_size=max(1, len(self.lanes)))
+            self.startup["detector_warmup_s"] = time.perf_counter() - warm_start
+        except Exception as e:
+            print(f"[ERROR] Gagal memuat detector: {e}")
+            self.startup["error"] = str(e)
+            return
+
+        self.detector = detector
+        self.device = detector.device
+        self.pipeline.set_detector(detector)
+        self.startup["detector_ready_s"] = time.perf_counter() - self.started_at
+        print(f"[INFO] Detector siap {self.startup['detector_ready_s']:.1f} s sejak start "
+              f"(load {self.startup['detector_load_s']:.1f} s, warm-up {self.startup['detector_warmup_s']:.1f} s)")
+
+        ocr_thread.join()
+        self.startup["models_ready_s"] = time.perf_counter() - self.started_at
+        self.ready.set()
+        print(f"[INFO] Semua model siap {self.startup['models_ready_s']:.1f} s sejak start")
+
+    def warm_up_ocr(self):
+        start = time.perf_counter()
+        try:
+            self.ocr_pool.warmup(self.preload_esrgan)
+        except Exception as e:
+            print(f"[WARNING] Warm-up OCR gagal: {e}")
+        self.startup["ocr_warmup_s"] = time.perf_counter() - start
+
+    def set_source(self, name, source):
+        lane = self.lanes[name]
+        backend = lane.capture_backend or self.capture_config.get("backend", 'auto')
+        # Default decode di resolusi native: crop plat untuk OCR diambil dari frame native
+        size = (self.frame_width, self.frame_height) if self.capture_config.get("decode_scaled", False) else (None, None)
+
+        def opener():
+            return open_capture(source, backend, *size)
+
+        cap = opener()
+        if not cap.isOpened():
+            print(f"[WARNING] Gagal buka kamera lane {name}: {source}")
+            return False
+
+        if lane.camera is not None:
+            lane.camera.stop()
+        lane.source = source
+        lane.error = None
+
+        def on_error():
+            lane.error = f"Tidak bisa baca frame kamera lane {name}"
+
+        lane.camera = Camera(
+            cap_getter=lambda: cap,
+            frame_setter=lambda frame, seq, captured_at: self.pipeline.submit(name, frame, seq, captured_at),
+            error_callback=on_error,
+            frame_wanted=lambda: self.pipeline.wants_frame(name),
+            opener=opener,
+            reconnect_max_delay=self.capture_config.get("reconnect_max_delay", 30.0),
+            name=name
+        )
+        lane.camera.start()
+        print(f"[INFO] Kamera lane {name} di-set ke: {source}")
+        return True
+
+    def set_roi(self, name, roi):
+        self.lanes[name].roi = tuple(roi)
+
+    def handle_plate_detection(self, name, candidate):
+        """Dipanggil dari thread pipeline untuk crop terbaik sebuah track kendaraan."""
+        lane = self.lanes[name]
+        crop = candidate["cropped_plate"]
+        lane.pending_preview = crop
+
+        # Crop yang hampir sama dengan crop track ini yang sudah dibaca tidak perlu enhancement + OCR lagi.
+        # Bacaannya sudah menjadi vote track, jadi tidak dihitung dua kali; crop final tetap menutup voting.
+        fingerprint = (dhash(crop), crop.shape[1] / crop.shape[0])
+        if lane.crop_cache.lookup(*fingerprint, candidate["track_id"]) is not None:
+            if candidate["final"]:
+                self.ocr_pool.submit_reading(name, None, 0.0, None, track_id=candidate["track_id"], final=True)
+            return
+        self.ocr_pool.submit(name, lane.is_entry, crop, track_id=candidate["track_id"],
+                             final=candidate["final"], fingerprint=fingerprint)
+
+    def remember_reading(self, request, plate_text, conf, enhanced_plate):
+        """Dipanggil worker OCR untuk setiap bacaan mentah, hasilnya disimpan di cache crop lane."""
+        lane = self.lanes.get(request.lane)
+        if lane is not None and request.fingerprint is not None:
+            lane.crop_cache.add(*request.fingerprint, request.track_id, (plate_text, conf, enhanced_plate))
+
+    def consume_results(self):
+        while self.running:
+            try:
+                name, plate_text, enhanced_plate, low_confidence = self.ocr_result_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self.handle_ocr_result(name, plate_text, enhanced_plate, low_confidence)
+            except Exception as e:
+                print(f"[ERROR] Gagal memproses hasil OCR lane {name}: {e}")
+
+    def handle_ocr_result(self, name, plate_text, enhanced_plate, low_confidence=False):
+        lane = self.lanes[name]
+        if not plate_text:
+            lane.ocr_skipped = True
+            return
+        if low_confidence:
+            # Tetap dicatat supaya tiket tidak yatim, tapi ditandai untuk dicek petugas
+            print(f"[WARNING] Plat {plate_text} lane {name} dibaca tanpa konsensus OCR, perlu dicek manual")
+            metrics.inc("plates_low_confidence_total", lane=name)
+
+        now = datetime.now()
+        lane.ocr_skipped = False
+        lane.last_plate = plate_text
+        lane.last_plate_time = now
+        if enhanced_plate is not None:
+            lane.last_enhanced = enhanced_plate
+
+        recorded = False
+        if not lane.plate_cache.is_recent(plate_text):
+            try:
+                if lane.is_entry:
+                    self.db.insert_entry(plate_text, now)
+                else:
+                    self.db.update_exit(plate_text, now)
+                lane.plate_cache.update(plate_text)
+                recorded = True
+                metrics.inc("plates_recorded_total", lane=name, direction=lane.direction)
+            except Exception as e:
+                print(f"[ERROR] Gagal update DB {lane.direction}: {e}")
+
+        self.publish({
+            "lane": name,
+            "direction": lane.direction,
+            "plat_nomor": plate_text,
+            "waktu": now.isoformat(),
+            "recorded": recorded,
+            "low_confidence": low_confidence,
+        })
+
+    def publish(self, event):
+        with self.lock:
+            self.event_seq += 1
+            event["seq"] = self.event_seq
+            self.events.append(event)
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Subscriber lambat kehilangan event terlama, bukan memblok thread service
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def subscribe(self, maxsize=100):
+        """Queue yang menerima setiap event plat baru."""
+        subscriber = queue.Queue(maxsize=maxsize)
+        with self.lock:
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def recent_events(self, after=0):
+        with self.lock:
+            return [event for event in self.events if event["seq"] > after]
+
+    def status(self):
+        ocr_stats = self.ocr_pool.stats()
+        lanes = {}
+        for name, lane in self.lanes.items():
+            camera = lane.camera
+            lanes[name] = {
+                "direction": lane.direction,
+                "source": lane.source,
+                "roi": list(lane.roi),
+                "camera_running": bool(camera and camera.running),
+                "camera_connected": bool(camera and camera.connected),
+                "camera": camera.stats() if camera else {},
+                "error": lane.error,
+                "last_plate": lane.last_plate,
+                "last_plate_time": lane.last_plate_time.isoformat() if lane.last_plate_time else None,
+                "pipeline": self.pipeline.stats(name),
+                "ocr_queue": ocr_stats["queue_depth"].get(name, 0),
+                "plate_cache": lane.plate_cache.stats(),
+                "crop_cache": lane.crop_cache.stats(),
+            }
+        return {
+            "running": self.running,
+            "ready": self.ready.is_set(),
+            "startup": dict(self.startup),
+            "device": self.device,
+            "lanes": lanes,
+            "ocr": ocr_stats,
+            "db": self.db.writer.stats(),
+        }
+
+    def stop(self):
+        """Idempoten: panggilan kedua tidak menutup database / menulis trace lagi."""
+        with self.lock:
+            if self.stopped:
+                return
+            self.stopped = True
+        self.running = False
+        self.pipeline.stop()
+        self.ocr_pool.stop()
+        for lane in self.lanes.values():
+            if lane.camera is not None:
+                lane.camera.stop()
+        self.db.close()
+        if self.trace_dump:
+            try:
+                metrics.REGISTRY.dump_trace(self.trace_dump)
+            except OSError as e:
+                print(f"[WARNING] Gagal menulis trace ke {self.trace_dump}: {e}")
@@ -0,0 +1,449 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+try:
+    import pymongo
+except ImportError:
+    # Hanya MongoStore yang butuh pymongo, store lokal tetap jalan tanpa
+    pymongo = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOCAL_DB_PATH = os.path.join(BASE_DIR, '../data/parking_local.sqlite3')
+
+# Arah urutan find_page, nilainya sama dengan pymongo.ASCENDING / DESCENDING
+ASCENDING = 1
+DESCENDING = -1
+
+# Format periode laporan, sama untuk SQLite dan Mongo supaya urutan string = urutan waktu
+REPORT_UNITS = {
+    "day": ("%Y-%m-%d", "substr({col}, 1, 10)"),
+    "hour": ("%Y-%m-%d %H:00", "substr({col}, 1, 10) || ' ' || substr({col}, 12, 2) || ':00'"),
+}
+
+
+def to_iso(value):
+    return value.isoformat(timespec='microseconds') if isinstance(value, datetime) else None
+
+
+def from_iso(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+class SqliteStore:
+    """Penyimpanan lokal append-only (SQLite WAL), selalu ditulis lebih dulu sebelum Mongo.
+
+    Tabel events adalah log event masuk/keluar yang nantinya direplikasi ke Mongo,
+    tabel sessions adalah proyeksi sesi parkir untuk dibaca UI ketika tanpa Mongo.
+    """
+
+    def __init__(self, path=LOCAL_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        self.create_schema()
+
+    @property
+    def conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def create_schema(self):
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_id TEXT UNIQUE NOT NULL,
+                    kind TEXT NOT NULL,
+                    plat_nomor TEXT NOT NULL,
+                    waktu TEXT NOT NULL,
+                    dibuat TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    plat_nomor TEXT NOT NULL,
+                    waktu_masuk TEXT NOT NULL,
+                    waktu_keluar TEXT,
+                    diperbarui TEXT NOT NULL
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS sesi_aktif_unik ON sessions(plat_nomor) WHERE waktu_keluar IS NULL;
+                CREATE INDEX IF NOT EXISTS sessions_diperbarui ON sessions(diperbarui);
+                CREATE INDEX IF NOT EXISTS sessions_waktu_masuk ON sessions(waktu_masuk, id);
+                CREATE INDEX IF NOT EXISTS sessions_plat_waktu ON sessions(plat_nomor, waktu_masuk, id);
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    name TEXT PRIMARY KEY,
+                    seq INTEGER NOT NULL
+                );
+            """)
+
+    def append_event(self, event_id, kind, plat_nomor, waktu):
+        """Catat event dan update proyeksi sesi dalam satu transaksi. Return True jika sesi berubah."""
+        now = to_iso(datetime.now())
+        with self.write_lock, self.conn:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO events (event_id, kind, plat_nomor, waktu, dibuat) VALUES (?, ?, ?, ?, ?)",
+                (event_id, kind, plat_nomor, to_iso(waktu), now))
+            if cur.rowcount == 0:
+                return False  # event yang sama sudah pernah dicatat
+            if kind == 'masuk':
+                event_seq = cur.lastrowid
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO sessions (plat_nomor, waktu_masuk, waktu_keluar, diperbarui) "
+                    "VALUES (?, ?, NULL, ?)", (plat_nomor, to_iso(waktu), now))
+                if cur.rowcount == 0:
+                    # Plat masih punya sesi aktif: event masuk dibuang supaya tidak direplikasi ke Mongo
+                    self.conn.execute("DELETE FROM events WHERE seq = ?", (event_seq,))
+                    return False
+            else:
+                cur = self.conn.execute(
+                    "UPDATE sessions SET waktu_keluar = ?, diperbarui = ? "
+                    "WHERE plat_nomor = ? AND waktu_keluar IS NULL AND waktu_masuk <= ?",
+                    (to_iso(waktu), now, plat_nomor, to_iso(waktu)))
+            return cur.rowcount > 0
+
+    def events_after(self, seq, limit=100):
+        rows = self.conn.execute(
+            "SELECT seq, event_id, kind, plat_nomor, waktu, dibuat FROM events WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, limit)).fetchall()
+        return [dict(row, waktu=from_iso(row["waktu"]), dibuat=from_iso(row["dibuat"])) for row in rows]
+
+    def last_seq(self):
+        row = self.conn.execute("SELECT MAX(seq) FROM events").fetchone()
+        return row[0] or 0
+
+    def get_checkpoint(self, name):
+        row = self.conn.execute("SELECT seq FROM checkpoints WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def set_checkpoint(self, name, seq):
+        with self.write_lock, self.conn:
+            self.conn.execute("INSERT INTO checkpoints (name, seq) VALUES (?, ?) "
+                              "ON CONFLICT(name) DO UPDATE SET seq = excluded.seq", (name, seq))
+
+    @staticmethod
+    def to_entry(row):
+        return {
+            "_id": row["id"],
+            "plat_nomor": row["plat_nomor"],
+            "waktu_masuk": from_iso(row["waktu_masuk"]),
+            "waktu_keluar": from_iso(row["waktu_keluar"]),
+            "diperbarui": from_iso(row["diperbarui"]),
+        }
+
+    def query(self, sql, params=()):
+        try:
+            return [self.to_entry(row) for row in self.conn.execute(sql, params).fetchall()]
+        except sqlite3.Error as e:
+            print(f"[ERROR] Gagal query database lokal: {e}")
+            return None
+
+    def fetch_all_entries(self):
+        return self.query("SELECT * FROM sessions") or []
+
+    def fetch_open_entries(self):
+        return self.query("SELECT * FROM sessions WHERE waktu_keluar IS NULL") or []
+
+    def fetch_recent_entries(self, limit=200):
+        return self.query("SELECT * FROM sessions ORDER BY waktu_masuk DESC, id DESC LIMIT ?", (limit,)) or []
+
+    def fetch_changes_since(self, since):
+        return self.query("SELECT * FROM sessions WHERE diperbarui >= ? ORDER BY diperbarui", (to_iso(since),))
+
+    def find_page(self, filter=None, sort=DESCENDING, cursor=None, limit=50):
+        filter = filter or {}
+        where, params = [], []
+        if filter.get("start"):
+            where.append("waktu_masuk >= ?")
+            params.append(to_iso(filter["start"]))
+        if filter.get("end"):
+            where.append("waktu_masuk < ?")
+            params.append(to_iso(filter["end"]))
+        prefix = (filter.get("plate_prefix") or "").strip().upper()
+        if prefix:
+            # Range prefix supaya index plat_nomor terpakai
+            where.append("plat_nomor >= ? AND plat_nomor < ?")
+            params.extend([prefix, prefix + "\uffff"])
+
+        op = "<" if sort == DESCENDING else ">"
+        if cursor is not None:
+            waktu_masuk, last_id = cursor
+            where.append(f"(waktu_masuk {op} ? OR (waktu_masuk = ? AND id {op} ?))")
+            params.extend([to_iso(waktu_masuk), to_iso(waktu_masuk), last_id])
+
+        direction = "DESC" if sort == DESCENDING else "ASC"
+        sql = "SELECT * FROM sessions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY waktu_masuk {direction}, id {direction} LIMIT ?"
+        entries = self.query(sql, params + [limit]) or []
+
+        next_cursor = None
+        if len(entries) == limit:
+            next_cursor = (entries[-1]["waktu_masuk"], entries[-1]["_id"])
+        return entries, next_cursor
+
+    @staticmethod
+    def range_filter(start=None, end=None):
+        where, params = [], []
+        if start:
+            where.append("waktu_masuk >= ?")
+            params.append(to_iso(start))
+        if end:
+            where.append("waktu_masuk < ?")
+            params.append(to_iso(end))
+        return (" WHERE " + " AND ".join(where)) if where else "", params
+
+    def stream(self, sql, params, batch_size):
+        cur = self.conn.execute(sql, params)
+        try:
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cur.close()
+
+    def iter_sessions(self, start=None, end=None, batch_size=1000):
+        """Semua sesi dalam rentang waktu_masuk, urut waktu_masuk, dibaca per batch."""
+        where, params = self.range_filter(start, end)
+        sql = f"SELECT * FROM sessions{where} ORDER BY waktu_masuk, id"
+        for row in self.stream(sql, params, batch_size):
+            yield self.to_entry(row)
+
+    def summarize_sessions(self, unit='day', start=None, end=None, now=None, overdue_seconds=3 * 3600,
+                           batch_size=1000):
+        """Per periode waktu_masuk: jumlah masuk, selesai, total durasi sesi selesai (detik), dan sesi
+        yang lebih lama dari overdue_seconds (sesi aktif dihitung sampai `now`). Urut periode."""
+        bucket = REPORT_UNITS[unit][1].format(col="waktu_masuk")
+        where, params = self.range_filter(start, end)
+        sql = (f"SELECT bucket, COUNT(*) AS masuk, COUNT(waktu_keluar) AS selesai, "
+               f"COALESCE(SUM(CASE WHEN waktu_keluar IS NOT NULL THEN durasi END), 0) AS durasi_total, "
+               f"SUM(CASE WHEN durasi > ? THEN 1 ELSE 0 END) AS terlambat "
+               f"FROM (SELECT {bucket} AS bucket, waktu_keluar, "
+               f"(julianday(COALESCE(waktu_keluar, ?)) - julianday(waktu_masuk)) * 86400.0 AS durasi "
+               f"FROM sessions{where}) GROUP BY bucket ORDER BY bucket")
+        now = to_iso(now or datetime.now())
+        for row in self.stream(sql, [overdue_seconds, now] + params, batch_size):
+            yield dict(row)
+
+    def iter_durations(self, unit='day', start=None, end=None, batch_size=1000):
+        """(periode, durasi detik) sesi selesai, urut periode lalu durasi, untuk persentil per periode."""
+        bucket = REPORT_UNITS[unit][1].format(col="waktu_masuk")
+        where, params = self.range_filter(start, end)
+        where += (" AND " if where else " WHERE ") + "waktu_keluar IS NOT NULL"
+        sql = (f"SELECT {bucket} AS bucket, (julianday(waktu_keluar) - julianday(waktu_masuk)) * 86400.0 AS durasi "
+               f"FROM sessions{where} ORDER BY bucket, durasi")
+        for row in self.stream(sql, params, batch_size):
+            yield row["bucket"], row["durasi"]
+
+
+class MongoStore:
+    def __init__(self, uri="mongodb://localhost:27017/", server_timeout_ms=2000):
+        if pymongo is None:
+            raise ImportError("Database Mongo butuh pymongo: pip install pymongo")
+        self.client = pymongo.MongoClient(uri, serverSelectionTimeoutMS=server_timeout_ms)
+        self.db = self.client["parking"]
+        self.col = self.db["db_plat"]
+        self.indexes_ready = False
+
+    def ping(self):
+        try:
+            self.client.admin.command('ping')
+            return True
+        except pymongo.errors.PyMongoError:
+            return False
+
+    def ensure_indexes(self):
+        if self.indexes_ready:
+            return
+        self.col.create_index([("plat_nomor", pymongo.ASCENDING), ("waktu_keluar", pymongo.ASCENDING)])
+        self.col.create_index([("diperbarui", pymongo.ASCENDING)])
+        # Index untuk pagination keyset riwayat (urut waktu_masuk, _id) dan pencarian prefix plat
+        self.col.create_index([("waktu_masuk", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)])
+        self.col.create_index([("plat_nomor", pymongo.ASCENDING), ("waktu_masuk", pymongo.DESCENDING),
+                               ("_id", pymongo.DESCENDING)])
+        self.ensure_open_session_index()
+        self.indexes_ready = True
+
+    def ensure_open_session_index(self):
+        # Maksimal satu sesi aktif (waktu_keluar null) per plat, menjaga upsert entry tetap atomik.
+        # Gagal dibuat = error, supaya replikasi ditahan dan tidak ada sesi aktif dobel yang masuk diam-diam
+        try:
+            self.col.create_index([("plat_nomor", pymongo.ASCENDING)], unique=True, name="sesi_aktif_unik",
+                                  partialFilterExpression={"waktu_keluar": {"$type": "null"}})
+        except pymongo.errors.PyMongoError as e:
+            print(f"[WARNING] Gagal membuat index unik sesi aktif (ada plat dobel yang masih aktif?): {e}")
+            raise
+
+    @staticmethod
+    def entry_op(plat_nomor, waktu_masuk):
+        # Dikunci pada (plat, waktu_masuk): replay batch [masuk, keluar] setelah sesi ditutup menemukan
+        # sesi yang sama dan tidak membuat sesi aktif baru. Masuk baru selagi plat masih punya sesi aktif
+        # ditolak index sesi_aktif_unik (duplicate key dilewati DbWriter.write)
+        return pymongo.UpdateOne(
+            {"plat_nomor": plat_nomor, "waktu_masuk": waktu_masuk},
+            {"$setOnInsert": {
+                "plat_nomor": plat_nomor,
+                "waktu_masuk": waktu_masuk,
+                "waktu_keluar": None,
+                "diperbarui": datetime.now()
+            }},
+            upsert=True
+        )
+
+    @staticmethod
+    def exit_op(plat_nomor, waktu_keluar):
+        # Hanya sesi yang masuk sebelum event keluar, aman jika event direplikasi ulang
+        return pymongo.UpdateOne(
+            {"plat_nomor": plat_nomor, "waktu_keluar": None, "waktu_masuk": {"$lte": waktu_keluar}},
+            {"$set": {"waktu_keluar": waktu_keluar, "diperbarui": datetime.now()}}
+        )
+
+    def bulk_write(self, ops):
+        """Bulk write berurutan. Op yang ditolak index sesi_aktif_unik (sesi aktif sudah ada) dilewati."""
+        while ops:
+            try:
+                self.col.bulk_write(ops, ordered=True)
+                return
+            except pymongo.errors.BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if not errors or errors[0].get("code") != 11000:
+                    raise
+                ops = ops[errors[0]["index"] + 1:]
+
+    def fetch_all_entries(self):
+        try:
+            return list(self.col.find({}))
+        except Exception as e:
+            print(f"[ERROR] Gagal fetch entries: {e}")
+            return []
+
+    def fetch_open_entries(self):
+        try:
+            return list(self.col.find({"waktu_keluar": None}))
+        except Exception as e:
+            print(f"[ERROR] Gagal fetch entry aktif: {e}")
+            return []
+
+    def fetch_recent_entries(self, limit=200):
+        try:
+            return list(self.col.find({}).sort("waktu_masuk", pymongo.DESCENDING).limit(limit))
+        except Exception as e:
+            print(f"[ERROR] Gagal fetch entry terbaru: {e}")
+            return []
+
+    def fetch_changes_since(self, since):
+        """Entry yang dibuat / diubah sejak `since` (field diperbarui), untuk update tabel secara incremental."""
+        try:
+            return list(self.col.find({"diperbarui": {"$gte": since}}).sort("diperbarui", pymongo.ASCENDING))
+        except Exception as e:
+            print(f"[ERROR] Gagal fetch perubahan: {e}")
+            return None
+
+    @staticmethod
+    def build_page_query(filter=None, sort=DESCENDING, cursor=None):
+        filter = filter or {}
+        query = {}
+
+        waktu_range = {"$type": "date"}
+        if filter.get("start"):
+            waktu_range["$gte"] = filter["start"]
+        if filter.get("end"):
+            waktu_range["$lt"] = filter["end"]
+        query["waktu_masuk"] = waktu_range
+
+        prefix = (filter.get("plate_prefix") or "").strip().upper()
+        if prefix:
+            # Regex prefix yang di-anchor tetap bisa memakai index plat_nomor
+            query["plat_nomor"] = {"$regex": "^" + re.escape(prefix)}
+
+        if cursor is not None:
+            waktu_masuk, last_id = cursor
+            op = "$lt" if sort == DESCENDING else "$gt"
+            query = {"$and": [query, {"$or": [
+                {"waktu_masuk": {op: waktu_masuk}},
+                {"waktu_masuk": waktu_masuk, "_id": {op: last_id}},
+            ]}]}
+        return query
+
+    def find_page(self, filter=None, sort=DESCENDING, cursor=None, limit=50):
+        """Satu halaman riwayat, urut waktu_masuk lalu _id.
+
+        filter: dict dengan key opsional plate_prefix, start, end (rentang waktu_masuk).
+        cursor: (waktu_masuk, _id) entry terakhir halaman sebelumnya.
+        Return (entries, cursor_berikutnya); cursor None jika sudah halaman terakhir.
+        """
+        try:
+            query = self.build_page_query(filter, sort, cursor)
+            entries = list(self.col.find(query)
+                           .sort([("waktu_masuk", sort), ("_id", sort)])
+                           .limit(limit))
+        except Exception as e:
+            print(f"[ERROR] Gagal fetch halaman riwayat: {e}")
+            return [], None
+
+        next_cursor = None
+        if len(entries) == limit:
+            next_cursor = (entries[-1]["waktu_masuk"], entries[-1]["_id"])
+        return entries, next_cursor
+
+    def iter_sessions(self, start=None, end=None, batch_size=1000):
+        """Semua sesi dalam rentang waktu_masuk lewat cursor, Mongo mengirim `batch_size` dokumen per round trip."""
+        query = self.build_page_query({"start": start, "end": end})
+        cursor = (self.col.find(query, {"plat_nomor": 1, "waktu_masuk": 1, "waktu_keluar": 1, "diperbarui": 1})
+                  .sort([("waktu_masuk", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+                  .batch_size(batch_size))
+        with cursor:
+            yield from cursor
+
+    def summarize_sessions(self, unit='day', start=None, end=None, now=None, overdue_seconds=3 * 3600,
+                           batch_size=1000):
+        """Sama dengan SqliteStore.summarize_sessions, dihitung di server dengan aggregation pipeline."""
+        duration = {"$divide": [{"$subtract": [{"$ifNull": ["$waktu_keluar", now or datetime.now()]},
+                                               "$waktu_masuk"]}, 1000]}
+        pipeline = [
+            {"$match": self.build_page_query({"start": start, "end": end})},
+            {"$project": {
+                "bucket": {"$dateToString": {"format": REPORT_UNITS[unit][0], "date": "$waktu_masuk"}},
+                "selesai": {"$cond": [{"$eq": [{"$type": "$waktu_keluar"}, "date"]}, 1, 0]},
+                "durasi": duration,
+            }},
+            {"$group": {
+                "_id": "$bucket",
+                "masuk": {"$sum": 1},
+                "selesai": {"$sum": "$selesai"},
+                "durasi_total": {"$sum": {"$cond": [{"$eq": ["$selesai", 1]}, "$durasi", 0]}},
+                "terlambat": {"$sum": {"$cond": [{"$gt": ["$durasi", overdue_seconds]}, 1, 0]}},
+            }},
+            {"$sort": {"_id": 1}},
+        ]
+        with self.col.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size) as cursor:
+            for row in cursor:
+                row["bucket"] = row.pop("_id")
+                yield row
+
+    def iter_durations(self, unit='day', start=None, end=None, batch_size=1000):
+        """(periode, durasi detik) sesi selesai, di-sort di server (boleh spill ke disk)."""
+        query = self.build_page_query({"start": start, "end": end})
+        pipeline = [
+            {"$match": {"$and": [query, {"waktu_keluar": {"$type": "date"}}]}},
+            {"$project": {
+                "_id": 0,
+                "bucket": {"$dateToString": {"format": REPORT_UNITS[unit][0], "date": "$waktu_masuk"}},
+                "durasi": {"$divide": [{"$subtract": ["$waktu_keluar", "$waktu_masuk"]}, 1000]},
+            }},
+            {"$sort": {"bucket": 1, "durasi": 1}},
+        ]
+        with self.col.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size) as cursor:
+            for row in cursor:
+                yield row["bucket"], row["durasi"]
@@ -0,0 +1,142 @@
+import bisect
+from datetime import datetime, timedelta
+from src.utils import format_duration
+
+MAX_DURATION = timedelta(hours=3)
+
+
+def sort_key(entry):
+    waktu_masuk = entry.get('waktu_masuk')
+    if not isinstance(waktu_masuk, datetime):
+        waktu_masuk = datetime.min
+    # Urutan tabel: waktu masuk terbaru di atas
+    return (-waktu_masuk.timestamp() if waktu_masuk != datetime.min else float('inf'), str(entry['_id']))
+
+
+def is_open(entry):
+    return not isinstance(entry.get('waktu_keluar'), datetime)
+
+
+def updated_at(entry):
+    for field in ('diperbarui', 'waktu_keluar', 'waktu_masuk'):
+        if isinstance(entry.get(field), datetime):
+            return entry[field]
+    return datetime.min
+
+
+def format_row(entry, now=None):
+    """Nilai kolom dan tag Treeview untuk satu entry, aturan sama dengan tabel monitoring lama."""
+    now = now or datetime.now()
+    plat_nomor = entry.get('plat_nomor', 'Tidak Dikenal')
+    waktu_masuk = entry.get('waktu_masuk', '-')
+    waktu_keluar = entry.get('waktu_keluar', '-')
+
+    if isinstance(waktu_masuk, datetime):
+        waktu_masuk_str = waktu_masuk.strftime('%H:%M')
+        tanggal_str = waktu_masuk.strftime('%d/%m/%Y')
+    else:
+        waktu_masuk_str = waktu_masuk
+        tanggal_str = '-'
+
+    if isinstance(waktu_keluar, datetime):
+        waktu_keluar_str = waktu_keluar.strftime('%H:%M')
+    else:
+        waktu_keluar_str = '-'
+
+    if waktu_masuk and isinstance(waktu_masuk, datetime):
+        end_time = waktu_keluar if isinstance(waktu_keluar, datetime) else now
+        durasi_td = end_time - waktu_masuk
+        durasi_str = format_duration(durasi_td)
+        is_overdue = durasi_td > MAX_DURATION
+    else:
+        durasi_str = "-"
+        is_overdue = False
+
+    tag = 'green' if waktu_masuk != '-' else ''
+    if is_overdue:
+        tag = 'overdue'
+    elif waktu_keluar_str != '-':
+        tag = 'ontime'
+
+    values = (tanggal_str, plat_nomor, waktu_masuk_str, waktu_keluar_str, durasi_str)
+    return values, (tag,) if tag else ()
+
+
+class SessionTableModel:
+    """Model in-memory tabel monitoring: semua sesi yang masih parkir + jendela sesi terbaru.
+
+    Setelah load awal hanya perubahan sejak `last_seen` yang diambil dari database.
+    """
+
+    def __init__(self, recent_limit=200, poll_overlap=timedelta(seconds=30)):
+        self.recent_limit = recent_limit
+        # `diperbarui` dicap saat write dibangun, bukan saat commit; write yang commit setelah poll
+        # tapi dicap sebelumnya tetap terambil selama lag commit < overlap. Baris yang tidak berubah
+        # di-dedupe oleh apply().
+        self.poll_overlap = poll_overlap
+        self.entries = {}  # iid -> entry
+        self.order = []  # (sort_key, iid), terurut
+        self.last_seen = None
+        self.loaded = False
+
+    def load_initial(self, db):
+        started = datetime.now()
+        entries = db.fetch_open_entries() + db.fetch_recent_entries(self.recent_limit)
+        self.last_seen = started - self.poll_overlap
+        self.loaded = True
+        return self.apply(entries)
+
+    def refresh(self, db):
+        """Return (iid baru, iid berubah, iid dihapus)."""
+        if not self.loaded:
+            return self.load_initial(db)
+
+        polled_at = datetime.now()
+        changes = db.fetch_changes_since(self.last_seen)
+        if changes is None:
+            return [], [], []
+        # Poll berikutnya mundur sebesar overlap dari waktu query
+        self.last_seen = polled_at - self.poll_overlap
+        return self.apply(changes)
+
+    def apply(self, entries):
+        added, changed = [], []
+        for entry in entries:
+            if entry.get('plat_nomor', 'Tidak Dikenal') == 'Tidak Dikenal':
+                continue
+            iid = str(entry['_id'])
+            previous = self.entries.get(iid)
+            if previous is None:
+                self.entries[iid] = entry
+                bisect.insort(self.order, (sort_key(entry), iid))
+                added.append(iid)
+            elif previous != entry:
+                self.entries[iid] = entry
+                changed.append(iid)
+
+        removed = self.trim()
+        # Sesi lama yang terambil lagi lewat overlap lalu langsung dibuang tidak pernah tampil di tabel
+        removed_new = removed.intersection(added)
+        added = [iid for iid in added if iid not in removed]
+        changed = [iid for iid in changed if iid not in removed]
+        return added, changed, removed - removed_new
+
+    def trim(self):
+        """Sesi selesai di luar jendela terbaru dibuang dari model.
+
+        Jendela dihitung dari `diperbarui` (waktu sesi terakhir berubah), bukan posisi waktu masuk,
+        supaya sesi parkir lama yang baru keluar tetap terlihat keluarnya di tabel.
+        """
+        closed = [iid for _, iid in self.order if not is_open(self.entries[iid])]
+        if len(closed) <= self.recent_limit:
+            return set()
+        closed.sort(key=lambda iid: updated_at(self.entries[iid]), reverse=True)
+        removed = set(closed[self.recent_limit:])
+        for iid in removed:
+            del self.entries[iid]
+        self.order = [(key, iid) for key, iid in self.order if iid not in removed]
+        return removed
+
+    def index_of(self, iid):
+        entry = self.entries[iid]
+        return bisect.bisect_left(self.order, (sort_key(entry), iid))
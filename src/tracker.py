@@ -0,0 +1,167 @@
+import time
+import cv2
+import numpy as np
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def centroid_distance(a, b):
+    ax, ay = (a[0] + a[2]) / 2.0, (a[1] + a[3]) / 2.0
+    bx, by = (b[0] + b[2]) / 2.0, (b[1] + b[3]) / 2.0
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5
+
+
+def crop_score(crop, conf):
+    """Skor kualitas crop: confidence x ukuran x ketajaman (variansi Laplacian)."""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+    area = crop.shape[0] * crop.shape[1]
+    return float(conf * np.log1p(area) * np.log1p(sharpness))
+
+
+class Track:
+    def __init__(self, track_id, det, now):
+        self.track_id = track_id
+        self.bbox = det["bbox"]
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 0
+        self.misses = 0
+        self.stable_count = 0
+        self.sent = []  # crop yang sudah dikirim ke OCR
+        self.best = []  # (score, confidence, crop), urut dari skor tertinggi
+        self.add(det, now)
+
+    def add(self, det, now, keep=3):
+        self.hits += 1
+        self.misses = 0
+        self.last_seen = now
+        score = crop_score(det["cropped_plate"], det["confidence"])
+        self.best.append((score, det["confidence"], det["cropped_plate"]))
+        self.best.sort(key=lambda item: item[0], reverse=True)
+        del self.best[keep:]
+
+
+class PlateTracker:
+    """Tracker IoU/centroid per lane. Hanya crop terbaik per kendaraan yang dikirim ke OCR."""
+
+    def __init__(self, iou_threshold=0.3, max_centroid_distance=60, max_missed=8, max_idle_seconds=1.5,
+                 stable_hits=5, stable_iou=0.8, min_hits=2, max_crops_per_track=2):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_missed = max_missed
+        self.max_idle_seconds = max_idle_seconds
+        self.stable_hits = stable_hits
+        self.stable_iou = stable_iou
+        self.min_hits = min_hits
+        self.max_crops_per_track = max_crops_per_track
+
+        self.tracks = {}
+        self.next_id = 1
+
+    def match(self, detections):
+        pairs = []
+        for track_id, track in self.tracks.items():
+            for i, det in enumerate(detections):
+                overlap = iou(track.bbox, det["bbox"])
+                if overlap >= self.iou_threshold:
+                    pairs.append((1.0 + overlap, track_id, i))
+                else:
+                    dist = centroid_distance(track.bbox, det["bbox"])
+                    if dist <= self.max_centroid_distance:
+                        pairs.append((1.0 - dist / self.max_centroid_distance, track_id, i))
+
+        # Greedy: pasangan paling mirip dulu
+        pairs.sort(reverse=True)
+        matched_tracks, matched_dets, matches = set(), set(), []
+        for _, track_id, i in pairs:
+            if track_id in matched_tracks or i in matched_dets:
+                continue
+            matched_tracks.add(track_id)
+            matched_dets.add(i)
+            matches.append((track_id, i))
+        return matches, matched_tracks, matched_dets
+
+    def update(self, detections, now=None):
+        """Update tracker dengan deteksi satu frame.
+
+        Setiap deteksi diberi "track_id". Return list kandidat OCR berupa dict
+        {"track_id", "cropped_plate", "confidence", "final"}.
+        """
+        now = time.time() if now is None else now
+        matches, matched_tracks, matched_dets = self.match(detections)
+
+        candidates = []
+        for track_id, i in matches:
+            track = self.tracks[track_id]
+            det = detections[i]
+            if iou(track.bbox, det["bbox"]) >= self.stable_iou:
+                track.stable_count += 1
+            else:
+                track.stable_count = 0
+            track.bbox = det["bbox"]
+            track.add(det, now)
+            det["track_id"] = track_id
+
+            # Kendaraan berhenti di depan gate: kirim crop terbaik sekarang, tidak perlu menunggu track selesai
+            if not track.sent and track.stable_count >= self.stable_hits:
+                candidates.extend(self.emit(track, 1, final=False))
+
+        for track_id in list(self.tracks):
+            if track_id in matched_tracks:
+                continue
+            track = self.tracks[track_id]
+            track.misses += 1
+            if track.misses > self.max_missed or now - track.last_seen > self.max_idle_seconds:
+                candidates.extend(self.end_track(track_id))
+
+        for i, det in enumerate(detections):
+            if i in matched_dets:
+                continue
+            track = Track(self.next_id, det, now)
+            self.tracks[track.track_id] = track
+            det["track_id"] = track.track_id
+            self.next_id += 1
+
+        return candidates
+
+    def end_track(self, track_id):
+        track = self.tracks.pop(track_id)
+        if track.hits < self.min_hits:
+            return []  # deteksi sesaat, kemungkinan false positive
+        return self.emit(track, self.max_crops_per_track - len(track.sent), final=True)
+
+    def emit(self, track, count, final):
+        candidates = []
+        for score, conf, crop in track.best:
+            if len(candidates) >= count:
+                break
+            # Crop yang sudah dikirim saat track stabil tidak dikirim ulang
+            if any(crop is sent for sent in track.sent):
+                continue
+            candidates.append({
+                "track_id": track.track_id,
+                "cropped_plate": crop,
+                "confidence": conf,
+                "score": score,
+                "final": False,
+            })
+        track.sent.extend(c["cropped_plate"] for c in candidates)
+        if final and candidates:
+            candidates[-1]["final"] = True
+        return candidates
+
+    def flush(self):
+        candidates = []
+        for track_id in list(self.tracks):
+            candidates.extend(self.end_track(track_id))
+        return candidates
@@ -2,22 +2,21 @@ import tkinter as tk
 from tkinter import ttk
 from src.handler import MParkingApp
 from src.roi import ROIManager
+from src.history import HistoryController
 
 class UI:
     def __init__(self, app: MParkingApp):
         self.app = app
         self.app.root.title("M-Parking")
         self.build_ui()
-        self.app.update_streams()
 
     def build_ui(self):
         main_frame = tk.Frame(self.app.root)
         main_frame.pack(fill="both", expand=True)
 
-        device_name = "GPU" if self.app.device == 'cuda' else 'cpu'
         cuda_frame = tk.Frame(self.app.root, height=40)
         cuda_frame.pack(fill="x", pady=10)
-        self.app.cuda_label = tk.Label(cuda_frame, text=f"Running on {device_name}", font=("Helvetica", 9))
+        self.app.cuda_label = tk.Label(cuda_frame, text=self.app.device_text(), font=("Helvetica", 9))
         self.app.cuda_label.pack(pady=5)
 
         input_frame = tk.Frame(main_frame)
@@ -31,6 +30,11 @@ class UI:
         self.app.entry_out = tk.Entry(input_frame, width=30)
         self.app.entry_out.grid(row=1, column=1, padx=5)
 
+        if self.app.lane_in is not None and self.app.lane_in.source is not None:
+            self.app.entry_in.insert(0, str(self.app.lane_in.source))
+        if self.app.lane_out is not None and self.app.lane_out.source is not None:
+            self.app.entry_out.insert(0, str(self.app.lane_out.source))
+
         def on_set_camera():
             source_in = self.app.entry_in.get().strip()
             source_out = self.app.entry_out.get().strip()
@@ -77,9 +81,17 @@ class UI:
         table_frame = tk.Frame(main_frame)
         table_frame.pack(pady=10, fill="both", expand=True, padx=20)
 
-        tk.Label(table_frame, text="Tabel Monitoring", font=("Helvetica", 16, "bold")).pack(pady=10)
+        notebook = ttk.Notebook(table_frame)
+        notebook.pack(fill="both", expand=True)
+
+        monitoring_tab = tk.Frame(notebook)
+        history_tab = tk.Frame(notebook)
+        notebook.add(monitoring_tab, text="Monitoring")
+        notebook.add(history_tab, text="Riwayat")
 
-        tree_frame = tk.Frame(table_frame)
+        tk.Label(monitoring_tab, text="Tabel Monitoring", font=("Helvetica", 16, "bold")).pack(pady=10)
+
+        tree_frame = tk.Frame(monitoring_tab)
         tree_frame.pack(fill="both", expand=True)
 
         columns = ('Tanggal', 'Plat Nomor', 'Waktu Masuk', 'Waktu Keluar', 'Durasi')
@@ -99,11 +111,58 @@ class UI:
         scrollbar.pack(side="right", fill="y")
         self.app.tree.pack(fill="both", expand=True, padx=100)
 
+        self.build_history(history_tab, columns)
 
-        self.app.roi_manager = ROIManager(self.app.canvas_in, self.app.canvas_out, self.app.frame_width, self.app.frame_height)
+        rois = {}
+        if self.app.lane_in is not None:
+            rois['roi_masuk'] = self.app.lane_in.roi
+        if self.app.lane_out is not None:
+            rois['roi_keluar'] = self.app.lane_out.roi
+        self.app.roi_manager = ROIManager(self.app.canvas_in, self.app.canvas_out, self.app.frame_width,
+                                          self.app.frame_height, on_change=self.app.on_roi_change, **rois)
 
         self.app.canvas_in.bind("<ButtonPress-1>", lambda e: self.app.roi_manager.on_mouse_down(e, 'in'))
         self.app.canvas_in.bind("<B1-Motion>", lambda e: self.app.roi_manager.on_mouse_move(e, 'in'))
 
         self.app.canvas_out.bind("<ButtonPress-1>", lambda e: self.app.roi_manager.on_mouse_down(e, 'out'))
         self.app.canvas_out.bind("<B1-Motion>", lambda e: self.app.roi_manager.on_mouse_move(e, 'out'))
+
+    def build_history(self, parent, columns):
+        filter_frame = tk.Frame(parent)
+        filter_frame.pack(fill='x', pady=10)
+
+        tk.Label(filter_frame, text="Plat:").pack(side='left')
+        entry_plate = tk.Entry(filter_frame, width=12)
+        entry_plate.pack(side='left', padx=5)
+
+        tk.Label(filter_frame, text="Dari (dd/mm/yyyy):").pack(side='left')
+        entry_start = tk.Entry(filter_frame, width=12)
+        entry_start.pack(side='left', padx=5)
+
+        tk.Label(filter_frame, text="Sampai:").pack(side='left')
+        entry_end = tk.Entry(filter_frame, width=12)
+        entry_end.pack(side='left', padx=5)
+
+        tree_frame = tk.Frame(parent)
+        tree_frame.pack(fill="both", expand=True)
+
+        history_tree = ttk.Treeview(tree_frame, columns=columns, show='headings')
+        for col in columns:
+            history_tree.heading(col, text=col)
+            history_tree.column(col, width=120, anchor='center')
+        history_tree.tag_configure('green', foreground='#006D5B')
+        history_tree.tag_configure('overdue', foreground='white', background='#800000')
+        history_tree.tag_configure('ontime', foreground='white', background='#0F52BA')
+
+        scrollbar = tk.Scrollbar(tree_frame, orient="vertical", command=history_tree.yview)
+        scrollbar.pack(side="right", fill="y")
+        history_tree.pack(fill="both", expand=True, padx=100)
+
+        self.app.history = HistoryController(self.app.root, self.app.db, history_tree, scrollbar)
+
+        def on_search(_event=None):
+            self.app.history.search(entry_plate.get(), entry_start.get(), entry_end.get())
+
+        tk.Button(filter_frame, text="Cari", command=on_search).pack(side='left', padx=10)
+        entry_plate.bind("<Return>", on_search)
+        on_search()
@@ -1,3 +1,4 @@
+import cv2
 import numpy as np
 
 def format_duration(td):
@@ -10,14 +11,26 @@ def format_duration(td):
     else:
         return f"{hours:02d}:{minutes:02d}"
 
-def is_same_crop(crop1, crop2, threshold=0.2):
-    if crop1 is None or crop2 is None:
-        return False
-    if crop1.shape != crop2.shape:
-        return False
+def apply_clahe(img):
+    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=1.0, tileGridSize=(8, 8))
+    cl = clahe.apply(l)
+    merged = cv2.merge((cl, a, b))
+    return cv2.cvtColor(merged, cv2.COLOR_LAB2BGR)
 
-    diff = np.sum(np.abs(crop1.astype(np.int16) - crop2.astype(np.int16)))
-    total_pixels = crop1.size
-    diff_ratio = diff / total_pixels
 
-    return diff_ratio < threshold
+def dhash(img, hash_size=16):
+    """Difference hash: gradient horizontal thumbnail grayscale, tahan terhadap geseran kecil dan perubahan terang."""
+    if img is None or img.size == 0:
+        return None
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    thumb = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    # Blur kecil di thumbnail meredam bit yang tidak stabil di area polos
+    thumb = cv2.GaussianBlur(thumb, (3, 3), 0)
+    bits = thumb[:, 1:] > thumb[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
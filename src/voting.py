@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict, defaultdict
+
+
+class PlateVoter:
+    """Konsensus beberapa bacaan OCR untuk satu kendaraan (track) sebelum plat di-commit.
+
+    Voting per posisi karakter dengan bobot confidence. Plat hanya di-commit satu kali per track,
+    saat kesepakatan melewati threshold. Kalau sampai bacaan final belum ada kesepakatan, hasil voting
+    tetap di-commit dengan tanda low confidence supaya kendaraan tidak hilang dan bisa dicek manual.
+    """
+
+    def __init__(self, agreement_threshold=0.6, min_readings=2, single_read_confidence=0.85, max_pending=64):
+        self.agreement_threshold = agreement_threshold
+        self.min_readings = min_readings
+        self.single_read_confidence = single_read_confidence
+        self.max_pending = max_pending
+
+        self.lock = threading.Lock()
+        self.pending = OrderedDict()  # key -> list (teks, confidence)
+        self.committed = OrderedDict()  # key yang sudah di-commit, agar tidak dobel
+
+    @staticmethod
+    def consensus(readings):
+        """Return (teks, agreement 0..1) dari list (teks, confidence)."""
+        if not readings:
+            return None, 0.0
+
+        # Panjang plat dipilih dulu, baru voting per posisi di antara bacaan dengan panjang tersebut
+        length_weight = defaultdict(float)
+        for text, conf in readings:
+            length_weight[len(text)] += max(conf, 1e-3)
+        total_weight = sum(length_weight.values())
+        length = max(length_weight, key=length_weight.get)
+        same_length = [(text, max(conf, 1e-3)) for text, conf in readings if len(text) == length]
+
+        chars = []
+        agreement = length_weight[length] / total_weight
+        for pos in range(length):
+            votes = defaultdict(float)
+            for text, conf in same_length:
+                votes[text[pos]] += conf
+            best = max(votes, key=votes.get)
+            chars.append(best)
+            agreement = min(agreement, votes[best] / sum(votes.values()))
+        return ''.join(chars), agreement
+
+    def add(self, key, text, conf, final=True):
+        """Tambah satu bacaan (text None jika tidak valid).
+
+        Return (plat, low_confidence); plat None kalau belum ada yang di-commit.
+        """
+        if key is None:
+            # Tanpa track, tidak ada yang bisa di-vote
+            return text, False
+
+        with self.lock:
+            if key in self.committed:
+                if final:
+                    self.committed.pop(key, None)
+                return None, False
+
+            readings = self.pending.setdefault(key, [])
+            self.pending.move_to_end(key)
+            if text:
+                readings.append((text, conf))
+
+            plate, agreement = self.consensus(readings)
+            decided = None
+            low_confidence = False
+            if plate and len(readings) >= self.min_readings and agreement >= self.agreement_threshold:
+                decided = plate
+            elif final and len(readings) == 1 and readings[0][1] >= self.single_read_confidence:
+                decided = plate
+            elif final and plate:
+                # Track selesai tanpa konsensus: commit hasil voting terbaik, jangan buang kendaraannya
+                decided = plate
+                low_confidence = True
+
+            if decided or final:
+                self.pending.pop(key, None)
+            if decided and not final:
+                self.committed[key] = True
+                while len(self.committed) > self.max_pending:
+                    self.committed.popitem(last=False)
+            while len(self.pending) > self.max_pending:
+                self.pending.popitem(last=False)
+            return decided, low_confidence
@@ -0,0 +1,52 @@
+import unittest
+import cv2
+import numpy as np
+from src.cache import PlateCache, CropCache
+from src.utils import dhash
+
+
+class PlateCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = PlateCache()
+        self.cache.update('B1234CD')
+
+    def test_same_plate_and_ocr_confusions_are_recent(self):
+        self.assertTrue(self.cache.is_recent('B1234CD'))
+        self.assertTrue(self.cache.is_recent('b 1234 cd'))
+        self.assertTrue(self.cache.is_recent('81234C0'))
+
+    def test_other_vehicles_are_not_recent(self):
+        for plate in ('B1235CD', 'D1234CD', '1234', 'B1234C'):
+            self.assertFalse(self.cache.is_recent(plate), plate)
+
+
+def render_plate(text, dx=0, dy=0):
+    img = np.full((76, 236, 3), 235, dtype=np.uint8)
+    cv2.putText(img, text, (18, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (20, 20, 20), 3)
+    # Geser jendela crop seperti jitter bbox detektor
+    return img[8 + dy:68 + dy, 8 + dx:228 + dx]
+
+
+class CropCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = CropCache()
+        crop = render_plate("B 1234 CD")
+        self.cache.add(dhash(crop), crop.shape[1] / crop.shape[0], 1, ('B1234CD', 0.9, None))
+
+    def lookup(self, crop, track_id):
+        return self.cache.lookup(dhash(crop), crop.shape[1] / crop.shape[0], track_id)
+
+    def test_one_character_different_plate_is_not_reused(self):
+        # Fingerprint-nya hampir sama, tapi track lain tidak boleh mendapat bacaan cache
+        self.assertIsNone(self.lookup(render_plate("B 1284 CD"), 2))
+
+    def test_jittered_crop_of_same_track_hits(self):
+        for dx, dy in ((1, 0), (0, 2), (3, 3)):
+            self.assertIsNotNone(self.lookup(render_plate("B 1234 CD", dx, dy), 1), (dx, dy))
+
+    def test_untracked_crop_never_hits(self):
+        self.assertIsNone(self.lookup(render_plate("B 1234 CD"), None))
+
+
+if __name__ == '__main__':
+    unittest.main()
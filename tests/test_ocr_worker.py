@@ -0,0 +1,71 @@
+import queue
+import unittest
+from src.ocr_worker import OcrQueue, OcrRequest, deliver
+from src.voting import PlateVoter
+
+
+class OcrQueueDropTest(unittest.TestCase):
+    def setUp(self):
+        self.voter = PlateVoter()
+        self.results = queue.Queue()
+        self.ocr_queue = OcrQueue(maxsize_per_lane=2, max_age=5.0, on_drop_final=self.close_track)
+
+    def close_track(self, request):
+        deliver(self.results, self.voter, request.lane, request.track_id, True, None, 0.0, None)
+
+    def request(self, track_id, final):
+        return OcrRequest('in', True, None, track_id=track_id, final=final)
+
+    def test_full_lane_evicts_non_final_before_final(self):
+        final = self.request(5, True)
+        self.ocr_queue.put(final)
+        self.ocr_queue.put(self.request(6, False))
+        self.ocr_queue.put(self.request(7, False))
+        pending = list(self.ocr_queue.lanes['in'])
+        self.assertIn(final, pending)
+        self.assertEqual([r.track_id for r in pending], [5, 7])
+        self.assertTrue(self.results.empty())
+
+    def test_full_lane_of_finals_closes_evicted_vote(self):
+        self.voter.add(('in', 5), 'B1234CD', 0.7, final=False)
+        self.ocr_queue.put(self.request(5, True))
+        self.ocr_queue.put(self.request(6, True))
+        # Crop non-final baru tidak menggeser crop final
+        self.ocr_queue.put(self.request(8, False))
+        self.assertTrue(self.results.empty())
+
+        self.ocr_queue.put(self.request(7, True))
+        self.assertEqual([r.track_id for r in self.ocr_queue.lanes['in']], [6, 7])
+        self.assertEqual(self.results.get_nowait(), ('in', 'B1234CD', None, True))
+        self.assertNotIn(('in', 5), self.voter.pending)
+
+    def test_stale_final_closes_vote(self):
+        self.voter.add(('in', 5), 'B1234CD', 0.7, final=False)
+        stale = self.request(5, True)
+        stale.enqueued_at -= 10.0
+        self.ocr_queue.put(stale)
+        with self.assertRaises(queue.Empty):
+            self.ocr_queue.get(timeout=0)
+        self.assertEqual(self.results.get_nowait(), ('in', 'B1234CD', None, True))
+        self.assertNotIn(('in', 5), self.voter.pending)
+
+    def test_stale_final_waits_for_in_flight_sibling(self):
+        sibling = self.request(5, False)
+        self.ocr_queue.put(sibling)
+        self.assertIs(self.ocr_queue.get(timeout=0), sibling)
+        stale = self.request(5, True)
+        stale.enqueued_at -= 10.0
+        self.ocr_queue.put(stale)
+        with self.assertRaises(queue.Empty):
+            self.ocr_queue.get(timeout=0)
+        self.assertTrue(self.results.empty())
+
+        self.voter.add(('in', 5), 'B1234CD', 0.7, final=False)
+        self.ocr_queue.done(sibling)
+        with self.assertRaises(queue.Empty):
+            self.ocr_queue.get(timeout=0)
+        self.assertEqual(self.results.get_nowait(), ('in', 'B1234CD', None, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from src.storage import SqliteStore
+
+
+class SqliteStoreEventTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = SqliteStore(os.path.join(self.tmpdir, 'parking.sqlite3'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def kinds(self):
+        return [(event["event_id"], event["kind"]) for event in self.store.events_after(0)]
+
+    def test_rejected_entry_is_not_logged_for_replication(self):
+        self.assertTrue(self.store.append_event('a', 'masuk', 'B1234CD', datetime(2026, 1, 1, 8)))
+        # Plat masih punya sesi aktif, masuk kedua ditolak dan tidak masuk tabel events
+        self.assertFalse(self.store.append_event('b', 'masuk', 'B1234CD', datetime(2026, 1, 1, 9)))
+        self.assertEqual(self.kinds(), [('a', 'masuk')])
+
+    def test_entry_after_exit_is_logged(self):
+        self.store.append_event('a', 'masuk', 'B1234CD', datetime(2026, 1, 1, 8))
+        self.assertTrue(self.store.append_event('b', 'keluar', 'B1234CD', datetime(2026, 1, 1, 9)))
+        self.assertTrue(self.store.append_event('c', 'masuk', 'B1234CD', datetime(2026, 1, 1, 10)))
+        self.assertEqual(self.kinds(), [('a', 'masuk'), ('b', 'keluar'), ('c', 'masuk')])
+
+
+if __name__ == '__main__':
+    unittest.main()
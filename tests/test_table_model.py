@@ -0,0 +1,27 @@
+import unittest
+from datetime import datetime, timedelta
+from src.table_model import SessionTableModel
+
+T0 = datetime(2026, 1, 1, 8)
+
+
+def entry(iid, plate, masuk, keluar=None):
+    return {"_id": iid, "plat_nomor": plate, "waktu_masuk": masuk, "waktu_keluar": keluar,
+            "diperbarui": keluar or masuk}
+
+
+class SessionTableModelTrimTest(unittest.TestCase):
+    def test_long_stay_stays_visible_when_it_exits(self):
+        model = SessionTableModel(recent_limit=3)
+        short_stays = [entry(10 + i, f"B{i}", T0 + timedelta(hours=1, minutes=i),
+                             T0 + timedelta(hours=1, minutes=i + 5)) for i in range(3)]
+        model.apply([entry(2, "B1001XY", T0)] + short_stays)
+
+        added, changed, removed = model.apply([entry(2, "B1001XY", T0, T0 + timedelta(hours=5))])
+        self.assertEqual(changed, ['2'])
+        self.assertEqual(removed, {'10'})
+        self.assertIn('2', model.entries)
+
+
+if __name__ == '__main__':
+    unittest.main()
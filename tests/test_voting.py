@@ -0,0 +1,37 @@
+import unittest
+from src.voting import PlateVoter
+
+
+class PlateVoterAddTest(unittest.TestCase):
+    def setUp(self):
+        self.voter = PlateVoter()
+        self.key = ('in', 1)
+
+    def test_agreeing_reads_commit_once(self):
+        self.assertEqual(self.voter.add(self.key, 'B1234CD', 0.7, final=False), (None, False))
+        self.assertEqual(self.voter.add(self.key, 'B1234CD', 0.6, final=False), ('B1234CD', False))
+        # Bacaan berikutnya dari track yang sama tidak di-commit ulang
+        self.assertEqual(self.voter.add(self.key, 'B1234CD', 0.9, final=True), (None, False))
+
+    def test_disagreeing_reads_commit_low_confidence_on_final(self):
+        self.assertEqual(self.voter.add(self.key, 'B1234CD', 0.7, final=False), (None, False))
+        self.assertEqual(self.voter.add(self.key, 'B1284CD', 0.6, final=True), ('B1234CD', True))
+        self.assertNotIn(self.key, self.voter.pending)
+
+    def test_single_confident_read_commits(self):
+        self.assertEqual(self.voter.add(self.key, 'B1234CD', 0.9, final=True), ('B1234CD', False))
+
+    def test_single_weak_read_commits_low_confidence(self):
+        self.assertEqual(self.voter.add(self.key, 'B1234CD', 0.8, final=True), ('B1234CD', True))
+
+    def test_final_without_valid_reading_commits_nothing(self):
+        self.assertEqual(self.voter.add(self.key, None, 0.0, final=False), (None, False))
+        self.assertEqual(self.voter.add(self.key, None, 0.0, final=True), (None, False))
+        self.assertNotIn(self.key, self.voter.pending)
+
+    def test_untracked_read_passes_through(self):
+        self.assertEqual(self.voter.add(None, 'B1234CD', 0.5), ('B1234CD', False))
+
+
+if __name__ == '__main__':
+    unittest.main()